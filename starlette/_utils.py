@@ -66,3 +66,49 @@ class AwaitableOrContextManagerWrapper(typing.Generic[SupportsAsyncCloseType]):
     async def __aexit__(self, *args: typing.Any) -> typing.Union[None, bool]:
         await self.entered.close()
         return None
+
+
+class SupportsName(typing.Protocol):
+    name: str
+
+
+SupportsNameType = typing.TypeVar("SupportsNameType", bound=SupportsName)
+
+
+def parse_accept_encoding(value: str) -> typing.Dict[str, float]:
+    """
+    Map each coding in an `Accept-Encoding` header to its quality value.
+    """
+    qualities = {}
+    for item in value.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, q = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(q)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def select_encoder(
+    accept_encoding: str, encoders: typing.Sequence[SupportsNameType]
+) -> typing.Optional[SupportsNameType]:
+    """
+    Return the encoder the client prefers, according to the quality values in
+    `Accept-Encoding`. Ties are broken by the order of `encoders`.
+    """
+    qualities = parse_accept_encoding(accept_encoding)
+    default = qualities.get("*", 0.0)
+    selected, selected_quality = None, 0.0
+    for encoder in encoders:
+        quality = qualities.get(encoder.name, default)
+        if quality > selected_quality:
+            selected, selected_quality = encoder, quality
+    return selected
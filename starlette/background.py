@@ -8,6 +8,7 @@ else:  # pragma: no cover
 
 from starlette._utils import is_async_callable
 from starlette.concurrency import run_in_threadpool
+from starlette.types import Scope
 
 P = ParamSpec("P")
 
@@ -41,3 +42,18 @@ class BackgroundTasks(BackgroundTask):
     async def __call__(self) -> None:
         for task in self.tasks:
             await task()
+
+
+async def run_background(background: BackgroundTask, scope: Scope) -> None:
+    """
+    Run the background task of a response that has just been sent.
+
+    Middleware that holds responses back, such as `DispatchMiddleware`, puts a
+    list in the scope to collect the tasks, and runs them once it has sent the
+    response itself.
+    """
+    deferred = scope.get("starlette.deferred_background")
+    if deferred is not None:
+        deferred.append(background)
+    else:
+        await background()
@@ -0,0 +1,168 @@
+import functools
+import time
+import typing
+from collections import OrderedDict
+
+from starlette._compat import md5_hexdigest
+from starlette._utils import is_async_callable
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response, precondition_response
+from starlette.types import Scope
+
+Endpoint = typing.Callable[[Request], typing.Any]
+
+
+class CacheEntry:
+    __slots__ = ("status_code", "body", "raw_headers", "expires")
+
+    def __init__(
+        self,
+        status_code: int,
+        body: bytes,
+        raw_headers: typing.List[typing.Tuple[bytes, bytes]],
+        expires: float,
+    ) -> None:
+        self.status_code = status_code
+        self.body = body
+        self.raw_headers = raw_headers
+        self.expires = expires
+
+    def response(self, scope: Scope) -> Response:
+        not_modified = precondition_response(scope, Headers(raw=self.raw_headers))
+        if not_modified is not None:
+            return not_modified
+        response = Response.__new__(Response)
+        response.status_code = self.status_code
+        response.background = None
+        response.body = self.body
+        response.raw_headers = self.raw_headers.copy()
+        return response
+
+
+def vary_header_names(response: Response) -> typing.Optional[typing.Tuple[str, ...]]:
+    """
+    Return the sorted request header names in the response's `Vary` header,
+    or `None` for `Vary: *`, where the response can't be reused at all.
+    """
+    names: typing.Set[str] = set()
+    for key, value in response.raw_headers:
+        if key == b"vary":
+            names.update(name.strip().lower() for name in value.decode().split(","))
+    names.discard("")
+    if "*" in names:
+        return None
+    return tuple(sorted(names))
+
+
+class ResponseCache:
+    """
+    Caches the rendered body and headers of `func(request) -> response`
+    endpoints, keyed by endpoint, path parameters and query string.
+
+    Only successful, fully rendered responses to `GET` and `HEAD` requests are
+    cached. Responses without an `ETag` are given one derived from their body,
+    and conditional requests are answered with `304 Not Modified`.
+    """
+
+    def __init__(
+        self, ttl: float = 60, max_entries: int = 1024, max_size: int = 16 * 1024**2
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        self.entries: "OrderedDict[typing.Hashable, CacheEntry]" = OrderedDict()
+        # The request headers named in the `Vary` header of each endpoint's
+        # most recent response, which are made part of the cache key.
+        self.vary: typing.Dict[Endpoint, typing.Tuple[str, ...]] = {}
+
+    def __call__(self, func: Endpoint) -> Endpoint:
+        @functools.wraps(func)
+        async def wrapper(request: Request) -> Response:
+            if request.method not in ("GET", "HEAD"):
+                return await self.call_endpoint(func, request)
+
+            key = (func, tuple(sorted(request.path_params.items())), request.url.query)
+            vary = self.vary.get(func, ())
+            entry = self.get(self.vary_key(key, vary, request))
+            if entry is None:
+                response = await self.call_endpoint(func, request)
+                response_vary = vary_header_names(response)
+                if response_vary is None:
+                    return response
+                self.vary[func] = response_vary
+                entry = self.set(self.vary_key(key, response_vary, request), response)
+                if entry is None:
+                    return response
+            return entry.response(request.scope)
+
+        return wrapper
+
+    def vary_key(
+        self, key: typing.Hashable, vary: typing.Tuple[str, ...], request: Request
+    ) -> typing.Hashable:
+        if not vary:
+            return key
+        values = tuple(tuple(request.headers.getlist(name)) for name in vary)
+        return (key, vary, values)
+
+    async def call_endpoint(self, func: Endpoint, request: Request) -> Response:
+        if is_async_callable(func):
+            return typing.cast(Response, await func(request))
+        return typing.cast(Response, await run_in_threadpool(func, request))
+
+    def get(self, key: typing.Hashable) -> typing.Optional[CacheEntry]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self.discard(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(
+        self, key: typing.Hashable, response: Response
+    ) -> typing.Optional[CacheEntry]:
+        # Streaming and file responses have no pre-rendered `body`.
+        body = getattr(response, "body", None)
+        if (
+            not isinstance(body, (bytes, bytearray, memoryview))
+            or response.status_code != 200
+            or response.background is not None
+            or len(body) > self.max_size
+        ):
+            return None
+        # Buffers may be reused by their owner once the response is sent.
+        body = bytes(body)
+        raw_headers = list(response.raw_headers)
+        names = {name for name, _ in raw_headers}
+        if b"set-cookie" in names:
+            return None
+        if b"etag" not in names:
+            etag = md5_hexdigest(body, usedforsecurity=False)
+            raw_headers.append((b"etag", f'"{etag}"'.encode("latin-1")))
+
+        self.discard(key)
+        entry = CacheEntry(
+            response.status_code,
+            body,
+            raw_headers,
+            time.monotonic() + self.ttl,
+        )
+        self.entries[key] = entry
+        self.size += len(entry.body)
+        while len(self.entries) > self.max_entries or self.size > self.max_size:
+            self.discard(next(iter(self.entries)))
+        return entry
+
+    def discard(self, key: typing.Hashable) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.body)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
@@ -1,4 +1,5 @@
 import functools
+import time
 import typing
 import warnings
 
@@ -49,11 +50,73 @@ def _next(iterator: typing.Iterator[T]) -> T:
         raise _StopIteration
 
 
+# A single `next()` call taking longer than this suggests the iterator is
+# blocked on I/O, so we hand back what we have rather than wait on another.
+# This is only checked once the call returns, so an item is still held back
+# while the call after it blocks.
+SLOW_ITEM_SECONDS = 0.001
+
+
+def _next_batch(
+    iterator: typing.Iterator[T],
+    batch_size: int,
+    batch_bytes: typing.Optional[int],
+) -> typing.Tuple[typing.List[T], typing.Optional[Exception]]:
+    # Pull up to `batch_size` items, or `batch_bytes` bytes of `str`/`bytes`
+    # items, in a single trip to the threadpool. An exception raised after
+    # some items have been pulled is returned rather than raised, so that
+    # those items are still delivered first. The same goes for exhaustion,
+    # which saves a final trip just to discover it.
+    batch: typing.List[T] = []
+    size = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            if not batch:
+                raise _StopIteration
+            return batch, _StopIteration()
+        except Exception as exc:
+            if not batch:
+                raise
+            return batch, exc
+        batch.append(item)
+        if len(batch) >= batch_size:
+            break
+        if batch_bytes is not None and isinstance(item, (bytes, str)):
+            size += len(item)
+            if size >= batch_bytes:
+                break
+        if time.perf_counter() - started > SLOW_ITEM_SECONDS:
+            break
+    return batch, None
+
+
 async def iterate_in_threadpool(
     iterator: typing.Iterator[T],
+    *,
+    batch_size: int = 1,
+    batch_bytes: typing.Optional[int] = None,
 ) -> typing.AsyncIterator[T]:
+    if batch_size == 1:
+        while True:
+            try:
+                yield await anyio.to_thread.run_sync(_next, iterator)
+            except _StopIteration:
+                break
+        return
+
     while True:
         try:
-            yield await anyio.to_thread.run_sync(_next, iterator)
+            batch, exc = await anyio.to_thread.run_sync(
+                _next_batch, iterator, batch_size, batch_bytes
+            )
         except _StopIteration:
             break
+        for item in batch:
+            yield item
+        if isinstance(exc, _StopIteration):
+            break
+        if exc is not None:
+            raise exc
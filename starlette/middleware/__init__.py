@@ -1,5 +1,7 @@
 import typing
 
+from starlette.types import ASGIApp, Receive, Scope, Send
+
 
 class Middleware:
     def __init__(self, cls: type, **options: typing.Any) -> None:
@@ -15,3 +17,74 @@ class Middleware:
         option_strings = [f"{key}={value!r}" for key, value in self.options.items()]
         args_repr = ", ".join([self.cls.__name__] + option_strings)
         return f"{class_name}({args_repr})"
+
+
+def compile_prefixes(
+    paths: typing.Optional[typing.Sequence[str]],
+) -> typing.Optional[typing.Tuple[str, ...]]:
+    if paths is None:
+        return None
+    # Matching `path + "/"` against prefixes ending in "/" means "/static"
+    # matches "/static" and "/static/css", but not "/staticfiles".
+    return tuple(path.rstrip("/") + "/" for path in paths)
+
+
+def compile_methods(
+    methods: typing.Optional[typing.Sequence[str]],
+) -> typing.Optional[typing.FrozenSet[str]]:
+    if methods is None:
+        return None
+    return frozenset(method.upper() for method in methods)
+
+
+class ScopedMiddleware:
+    """
+    Runs `middleware` for requests that match the given path prefixes and
+    methods, and sends other requests straight to `app`, the application it
+    wraps.
+
+    Path prefixes apply to HTTP and websocket requests, and methods to HTTP
+    requests only. Any other scopes, such as lifespan, always go through
+    `middleware`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        middleware: Middleware,
+        *,
+        include_paths: typing.Optional[typing.Sequence[str]] = None,
+        exclude_paths: typing.Optional[typing.Sequence[str]] = None,
+        include_methods: typing.Optional[typing.Sequence[str]] = None,
+        exclude_methods: typing.Optional[typing.Sequence[str]] = None,
+    ) -> None:
+        cls, options = middleware
+        self.app = app
+        self.middleware: ASGIApp = cls(app=app, **options)
+        self.include_paths = compile_prefixes(include_paths)
+        self.exclude_paths = compile_prefixes(exclude_paths)
+        self.include_methods = compile_methods(include_methods)
+        self.exclude_methods = compile_methods(exclude_methods)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.applies(scope):
+            await self.middleware(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    def applies(self, scope: Scope) -> bool:
+        scope_type = scope["type"]
+        if scope_type != "http" and scope_type != "websocket":
+            return True
+        path = scope["path"] + "/"
+        if self.include_paths is not None and not path.startswith(self.include_paths):
+            return False
+        if self.exclude_paths is not None and path.startswith(self.exclude_paths):
+            return False
+        if scope_type == "http":
+            method = scope["method"]
+            if self.include_methods is not None and method not in self.include_methods:
+                return False
+            if self.exclude_methods is not None and method in self.exclude_methods:
+                return False
+        return True
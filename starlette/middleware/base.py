@@ -152,6 +152,11 @@ class BaseHTTPMiddleware:
                 recv_stream.close()
 
             async def send_no_error(message: Message) -> None:
+                if message["type"] == "http.response.early_hint":
+                    # Early hints aren't part of the response, so they're sent
+                    # straight on, rather than to `call_next()`.
+                    await send(message)
+                    return
                 try:
                     await send_stream.send(message)
                 except anyio.BrokenResourceError:
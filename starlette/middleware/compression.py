@@ -0,0 +1,405 @@
+import hashlib
+import typing
+import zlib
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+import anyio
+
+from starlette._utils import select_encoder
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ModuleNotFoundError:  # pragma: nocover
+    brotli = None
+
+try:
+    import zstandard
+except ModuleNotFoundError:  # pragma: nocover
+    zstandard = None
+
+Compress = typing.Callable[[bytes, bool], bytes]
+
+# Media types that are usually worth compressing. Images, audio, video and
+# archives are already compressed, and rarely shrink any further.
+DEFAULT_COMPRESSIBLE_TYPES = (
+    "text/*",
+    "application/json",
+    "application/*+json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/*+xml",
+    "image/svg+xml",
+)
+
+# Media types whose streamed chunks are flushed as they are sent, so clients
+# see each one straight away. Other streams are left to the compressor to
+# buffer, which compresses much better than flushing every small chunk.
+DEFAULT_FLUSHED_TYPES = ("text/event-stream",)
+
+
+class Encoder:
+    """
+    A content coding that responses can be compressed with.
+
+    Subclasses set `name` to the coding's `Accept-Encoding` token, and
+    implement `compressor()` to return a function that compresses one chunk of
+    a response body, given the chunk and whether more chunks will follow. If
+    `flush` is true, each chunk must be flushed, so clients can decompress it
+    as soon as it arrives. Otherwise the compressor may buffer.
+    """
+
+    name: str
+    default_level: int
+
+    def __init__(
+        self, level: typing.Optional[int] = None, minimum_size: int = 500
+    ) -> None:
+        self.level = self.default_level if level is None else level
+        self.minimum_size = minimum_size
+
+    def compressor(self, flush: bool = False) -> Compress:
+        raise NotImplementedError()  # pragma: no cover
+
+
+class GZipEncoder(Encoder):
+    name = "gzip"
+    default_level = 6
+    # A `wbits` of 16 + 15 writes a gzip header and trailer.
+    wbits = 31
+
+    def compressor(self, flush: bool = False) -> Compress:
+        compressobj = zlib.compressobj(self.level, zlib.DEFLATED, self.wbits)
+
+        def compress(data: bytes, more_body: bool) -> bytes:
+            output = compressobj.compress(data)
+            if not more_body:
+                return output + compressobj.flush(zlib.Z_FINISH)
+            if flush:
+                # A sync flush lets clients decompress everything sent so far
+                # without waiting for the rest.
+                return output + compressobj.flush(zlib.Z_SYNC_FLUSH)
+            return output
+
+        return compress
+
+
+class DeflateEncoder(GZipEncoder):
+    # HTTP's "deflate" coding is the zlib format, not raw deflate.
+    name = "deflate"
+    wbits = 15
+
+
+class BrotliEncoder(Encoder):
+    name = "br"
+    # Brotli's higher levels are meant for compressing ahead of time.
+    default_level = 4
+
+    def compressor(self, flush: bool = False) -> Compress:
+        compressor = brotli.Compressor(quality=self.level)
+
+        def compress(data: bytes, more_body: bool) -> bytes:
+            output: bytes = compressor.process(data)
+            if not more_body:
+                end: bytes = compressor.finish()
+                return output + end
+            if flush:
+                end = compressor.flush()
+                return output + end
+            return output
+
+        return compress
+
+
+class ZstdEncoder(Encoder):
+    name = "zstd"
+    default_level = 3
+
+    def compressor(self, flush: bool = False) -> Compress:
+        compressobj = zstandard.ZstdCompressor(level=self.level).compressobj()
+
+        def compress(data: bytes, more_body: bool) -> bytes:
+            output: bytes = compressobj.compress(data)
+            if not more_body:
+                end: bytes = compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+                return output + end
+            if flush:
+                end = compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+                return output + end
+            return output
+
+        return compress
+
+
+def default_encoders() -> typing.List[Encoder]:
+    """
+    Return an instance of every built-in encoder that can be used, in order of
+    preference.
+    """
+    encoders: typing.List[Encoder] = []
+    if brotli is not None:
+        encoders.append(BrotliEncoder())  # pragma: no cover
+    if zstandard is not None:
+        encoders.append(ZstdEncoder())  # pragma: no cover
+    encoders.extend([GZipEncoder(), DeflateEncoder()])
+    return encoders
+
+
+class CompressionCache:
+    """
+    Keeps the compressed bodies of complete, non-streaming responses, keyed
+    by a SHA-256 hash of the uncompressed body and the encoder used, so that
+    identical responses are only compressed once.
+    """
+
+    def __init__(
+        self, max_body_size: int = 1024 * 1024, max_size: int = 64 * 1024 * 1024
+    ) -> None:
+        self.max_body_size = max_body_size
+        self.max_size = max_size
+        self.size = 0
+        self.entries: "OrderedDict[typing.Hashable, bytes]" = OrderedDict()
+
+    def key(self, body: bytes, encoder: Encoder) -> typing.Hashable:
+        return (hashlib.sha256(body).digest(), encoder.name, encoder.level)
+
+    def get(self, key: typing.Hashable) -> typing.Optional[bytes]:
+        compressed = self.entries.get(key)
+        if compressed is not None:
+            self.entries.move_to_end(key)
+        return compressed
+
+    def set(self, key: typing.Hashable, compressed: bytes) -> None:
+        if len(compressed) > self.max_size:
+            return
+        self.discard(key)
+        self.entries[key] = compressed
+        self.size += len(compressed)
+        while self.size > self.max_size:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, key: typing.Hashable) -> None:
+        compressed = self.entries.pop(key, None)
+        if compressed is not None:
+            self.size -= len(compressed)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        encoders: typing.Optional[typing.Sequence[Encoder]] = None,
+        compressible_types: typing.Optional[
+            typing.Sequence[str]
+        ] = DEFAULT_COMPRESSIBLE_TYPES,
+        excluded_types: typing.Sequence[str] = (),
+        flushed_types: typing.Sequence[str] = DEFAULT_FLUSHED_TYPES,
+        threadpool_minimum_size: int = 128 * 1024,
+        cache: typing.Optional[CompressionCache] = None,
+    ) -> None:
+        self.app = app
+        self.encoders = default_encoders() if encoders is None else list(encoders)
+        self.compressible_types = compressible_types
+        self.excluded_types = excluded_types
+        self.flushed_types = flushed_types
+        self.threadpool_minimum_size = threadpool_minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoder = select_encoder(headers.get("Accept-Encoding", ""), self.encoders)
+            if encoder is not None:
+                responder = CompressionResponder(
+                    self.app,
+                    encoder,
+                    compressible_types=self.compressible_types,
+                    excluded_types=self.excluded_types,
+                    flushed_types=self.flushed_types,
+                    threadpool_minimum_size=self.threadpool_minimum_size,
+                    cache=self.cache,
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(
+        self,
+        app: ASGIApp,
+        encoder: Encoder,
+        compressible_types: typing.Optional[
+            typing.Sequence[str]
+        ] = DEFAULT_COMPRESSIBLE_TYPES,
+        excluded_types: typing.Sequence[str] = (),
+        flushed_types: typing.Sequence[str] = DEFAULT_FLUSHED_TYPES,
+        threadpool_minimum_size: int = 128 * 1024,
+        cache: typing.Optional[CompressionCache] = None,
+    ) -> None:
+        self.app = app
+        self.encoder = encoder
+        self.minimum_size = encoder.minimum_size
+        self.compressible_types = compressible_types
+        self.excluded_types = excluded_types
+        self.flushed_types = flushed_types
+        self.threadpool_minimum_size = threadpool_minimum_size
+        self.cache = cache
+        self.send: Send = unattached_send
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressed = False
+        self.flush = False
+        self.compressor: typing.Optional[Compress] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Don't send the initial message until we've determined how to
+            # modify the outgoing headers correctly.
+            self.initial_message = message
+            headers = Headers(raw=self.initial_message["headers"])
+            if not self.should_compress(headers):
+                # There's nothing to decide, so send the headers straight away.
+                self.passthrough = True
+                self.started = True
+                await self.send(message)
+            else:
+                media_type = get_media_type(headers)
+                self.flush = media_type is not None and any(
+                    fnmatchcase(media_type, pattern) for pattern in self.flushed_types
+                )
+        elif message_type == "http.response.body" and self.passthrough:
+            await self.send(message)
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if len(body) < self.minimum_size and not more_body:
+                # Don't compress small outgoing responses.
+                await self.send(self.initial_message)
+                await self.send(message)
+            elif not more_body:
+                # Standard compressed response.
+                body = await self.compress_complete(body)
+
+                headers = MutableHeaders(raw=self.initial_message["headers"])
+                headers["Content-Encoding"] = self.encoder.name
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                self.set_compressed(headers)
+                message["body"] = body
+
+                await self.send(self.initial_message)
+                await self.send(message)
+            else:
+                # Initial body in streaming compressed response.
+                headers = MutableHeaders(raw=self.initial_message["headers"])
+                headers["Content-Encoding"] = self.encoder.name
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                self.set_compressed(headers)
+
+                message["body"] = await self.compress(body, more_body=True)
+
+                await self.send(self.initial_message)
+                if message["body"]:
+                    await self.send(message)
+
+        elif message_type == "http.response.body":
+            # Remaining body in streaming compressed response.
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            message["body"] = await self.compress(body, more_body)
+
+            # Unless it is flushing, the compressor often buffers whole chunks.
+            if message["body"] or not more_body:
+                await self.send(message)
+
+        elif message_type == "http.response.early_hint":
+            # Early hints aren't part of the response, so go straight through.
+            await self.send(message)
+
+        elif message_type == "http.response.trailers":
+            if self.compressed:
+                # Trailers such as `Content-Digest` describe the uncompressed
+                # body, so they'd be wrong for the compressed one.
+                message = {**message, "headers": []}
+            await self.send(message)
+
+    def should_compress(self, headers: Headers) -> bool:
+        """
+        Return `False` for responses that are already encoded, that ask
+        not to be transformed, or whose media type isn't worth compressing.
+        """
+        if "content-encoding" in headers:
+            return False
+        cache_control = headers.get("cache-control", "")
+        if "no-transform" in cache_control.lower():
+            return False
+        media_type = get_media_type(headers)
+        if media_type is None:
+            return True
+        if any(fnmatchcase(media_type, pattern) for pattern in self.excluded_types):
+            return False
+        return self.compressible_types is None or any(
+            fnmatchcase(media_type, pattern) for pattern in self.compressible_types
+        )
+
+    async def compress_complete(self, body: bytes) -> bytes:
+        """
+        Compress the body of a non-streaming response, using the cache if
+        there is one.
+        """
+        if self.cache is None or len(body) > self.cache.max_body_size:
+            return await self.compress(body, more_body=False)
+        key = self.cache.key(body, self.encoder)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = await self.compress(body, more_body=False)
+            self.cache.set(key, compressed)
+        return compressed
+
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        # Compressors are only created for responses that are compressed, as
+        # some allocate hundreds of kilobytes of state.
+        if self.compressor is None:
+            self.compressor = (
+                self.encoder.compressor(flush=True)
+                if self.flush
+                else self.encoder.compressor()
+            )
+        if len(body) >= self.threadpool_minimum_size:
+            # Compressing large chunks would block the event loop for a long
+            # time, but the compression libraries release the GIL.
+            return await anyio.to_thread.run_sync(self.compressor, body, more_body)
+        return self.compressor(body, more_body)
+
+    def set_compressed(self, headers: MutableHeaders) -> None:
+        self.compressed = True
+        if "trailer" in headers:
+            del headers["trailer"]
+
+
+def get_media_type(headers: Headers) -> typing.Optional[str]:
+    content_type = headers.get("content-type")
+    if content_type is None:
+        return None
+    return content_type.partition(";")[0].strip().lower()
+
+
+async def unattached_send(message: Message) -> typing.NoReturn:
+    raise RuntimeError("send awaitable not set")  # pragma: no cover
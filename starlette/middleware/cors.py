@@ -1,16 +1,42 @@
 import functools
 import re
 import typing
+from collections import OrderedDict
 
 from starlette.datastructures import Headers, MutableHeaders
-from starlette.responses import PlainTextResponse, Response
+from starlette.responses import PlainTextResponse, Response, ResponseTemplate
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
 SAFELISTED_HEADERS = {"Accept", "Accept-Language", "Content-Language", "Content-Type"}
 
+RawHeaders = typing.List[typing.Tuple[bytes, bytes]]
+
+
+def encode_headers(headers: typing.Mapping[str, str]) -> RawHeaders:
+    return [
+        (key.lower().encode("latin-1"), value.encode("latin-1"))
+        for key, value in headers.items()
+    ]
+
+
+class OriginPolicy(typing.NamedTuple):
+    """
+    Everything the middleware needs to know to respond to one origin.
+    """
+
+    allowed: bool
+    # Headers for simple responses that mirror back the origin.
+    simple_headers: RawHeaders
+    preflight_headers: typing.Dict[str, str]
+    preflight_response: ResponseTemplate
+
 
 class CORSMiddleware:
+    # The number of origins, and of distinct `Access-Control-Request-Headers`
+    # values, to keep decisions for.
+    cache_size = 1024
+
     def __init__(
         self,
         app: ASGIApp,
@@ -60,7 +86,7 @@ class CORSMiddleware:
             preflight_headers["Access-Control-Allow-Credentials"] = "true"
 
         self.app = app
-        self.allow_origins = allow_origins
+        self.allow_origins = frozenset(allow_origins)
         self.allow_methods = allow_methods
         self.allow_headers = [h.lower() for h in allow_headers]
         self.allow_all_origins = allow_all_origins
@@ -69,6 +95,9 @@ class CORSMiddleware:
         self.allow_origin_regex = compiled_allow_origin_regex
         self.simple_headers = simple_headers
         self.preflight_headers = preflight_headers
+        self.simple_raw_headers = encode_headers(simple_headers)
+        self.origin_policies: "OrderedDict[str, OriginPolicy]" = OrderedDict()
+        self.requested_headers_allowed: "OrderedDict[str, bool]" = OrderedDict()
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":  # pragma: no cover
@@ -91,30 +120,66 @@ class CORSMiddleware:
         await self.simple_response(scope, receive, send, request_headers=headers)
 
     def is_allowed_origin(self, origin: str) -> bool:
-        if self.allow_all_origins:
-            return True
+        return self.get_origin_policy(origin).allowed
 
-        if self.allow_origin_regex is not None and self.allow_origin_regex.fullmatch(
-            origin
-        ):
-            return True
+    def get_origin_policy(self, origin: str) -> OriginPolicy:
+        policy = self.origin_policies.get(origin)
+        if policy is None:
+            policy = self.build_origin_policy(origin)
+            self.origin_policies[origin] = policy
+            if len(self.origin_policies) > self.cache_size:
+                self.origin_policies.popitem(last=False)
+        else:
+            self.origin_policies.move_to_end(origin)
+        return policy
 
-        return origin in self.allow_origins
+    def build_origin_policy(self, origin: str) -> OriginPolicy:
+        allowed = (
+            self.allow_all_origins
+            or origin in self.allow_origins
+            or (
+                self.allow_origin_regex is not None
+                and self.allow_origin_regex.fullmatch(origin) is not None
+            )
+        )
+        simple_headers = {**self.simple_headers, "Access-Control-Allow-Origin": origin}
+        preflight_headers = dict(self.preflight_headers)
+        if allowed and self.preflight_explicit_allow_origin:
+            # The "else" case is already accounted for in self.preflight_headers
+            # and the value would be "*".
+            preflight_headers["Access-Control-Allow-Origin"] = origin
+        return OriginPolicy(
+            allowed=allowed,
+            simple_headers=encode_headers(simple_headers),
+            preflight_headers=preflight_headers,
+            preflight_response=ResponseTemplate(
+                PlainTextResponse, status_code=200, headers=preflight_headers
+            ),
+        )
+
+    def is_allowed_headers(self, requested_headers: str) -> bool:
+        allowed = self.requested_headers_allowed.get(requested_headers)
+        if allowed is None:
+            allowed = all(
+                header.strip() in self.allow_headers
+                for header in requested_headers.lower().split(",")
+            )
+            self.requested_headers_allowed[requested_headers] = allowed
+            if len(self.requested_headers_allowed) > self.cache_size:
+                self.requested_headers_allowed.popitem(last=False)
+        else:
+            self.requested_headers_allowed.move_to_end(requested_headers)
+        return allowed
 
     def preflight_response(self, request_headers: Headers) -> Response:
         requested_origin = request_headers["origin"]
         requested_method = request_headers["access-control-request-method"]
         requested_headers = request_headers.get("access-control-request-headers")
 
-        headers = dict(self.preflight_headers)
+        policy = self.get_origin_policy(requested_origin)
         failures = []
 
-        if self.is_allowed_origin(origin=requested_origin):
-            if self.preflight_explicit_allow_origin:
-                # The "else" case is already accounted for in self.preflight_headers
-                # and the value would be "*".
-                headers["Access-Control-Allow-Origin"] = requested_origin
-        else:
+        if not policy.allowed:
             failures.append("origin")
 
         if requested_method not in self.allow_methods:
@@ -122,22 +187,22 @@ class CORSMiddleware:
 
         # If we allow all headers, then we have to mirror back any requested
         # headers in the response.
+        mirrored_headers = None
         if self.allow_all_headers and requested_headers is not None:
-            headers["Access-Control-Allow-Headers"] = requested_headers
+            mirrored_headers = {"Access-Control-Allow-Headers": requested_headers}
         elif requested_headers is not None:
-            for header in [h.lower() for h in requested_headers.split(",")]:
-                if header.strip() not in self.allow_headers:
-                    failures.append("headers")
-                    break
+            if not self.is_allowed_headers(requested_headers):
+                failures.append("headers")
 
         # We don't strictly need to use 400 responses here, since its up to
         # the browser to enforce the CORS policy, but its more informative
         # if we do.
         if failures:
             failure_text = "Disallowed CORS " + ", ".join(failures)
+            headers = {**policy.preflight_headers, **(mirrored_headers or {})}
             return PlainTextResponse(failure_text, status_code=400, headers=headers)
 
-        return PlainTextResponse("OK", status_code=200, headers=headers)
+        return policy.preflight_response("OK", headers=mirrored_headers)
 
     async def simple_response(
         self, scope: Scope, receive: Receive, send: Send, request_headers: Headers
@@ -153,24 +218,42 @@ class CORSMiddleware:
             return
 
         message.setdefault("headers", [])
-        headers = MutableHeaders(scope=message)
-        headers.update(self.simple_headers)
         origin = request_headers["Origin"]
         has_cookie = "cookie" in request_headers
 
         # If request includes any cookie headers, then we must respond
         # with the specific origin instead of '*'.
         if self.allow_all_origins and has_cookie:
-            self.allow_explicit_origin(headers, origin)
+            self.allow_explicit_origin(message, self.get_origin_policy(origin))
 
         # If we only allow specific origins, then we have to mirror back
         # the Origin header in the response.
-        elif not self.allow_all_origins and self.is_allowed_origin(origin=origin):
-            self.allow_explicit_origin(headers, origin)
+        elif not self.allow_all_origins:
+            policy = self.get_origin_policy(origin)
+            if policy.allowed:
+                self.allow_explicit_origin(message, policy)
+            else:
+                self.set_raw_headers(message, self.simple_raw_headers)
+
+        else:
+            self.set_raw_headers(message, self.simple_raw_headers)
 
         await send(message)
 
+    @classmethod
+    def allow_explicit_origin(cls, message: Message, policy: OriginPolicy) -> None:
+        cls.set_raw_headers(message, policy.simple_headers)
+        MutableHeaders(scope=message).add_vary_header("Origin")
+
     @staticmethod
-    def allow_explicit_origin(headers: MutableHeaders, origin: str) -> None:
-        headers["Access-Control-Allow-Origin"] = origin
-        headers.add_vary_header("Origin")
+    def set_raw_headers(message: Message, raw_headers: RawHeaders) -> None:
+        """
+        Set pre-encoded headers on a response start message, replacing any
+        existing headers of the same names.
+        """
+        if not raw_headers:
+            return
+        names = {key for key, _ in raw_headers}
+        message["headers"] = [
+            (key, value) for key, value in message["headers"] if key not in names
+        ] + raw_headers
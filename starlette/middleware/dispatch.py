@@ -0,0 +1,200 @@
+import typing
+
+from starlette.background import BackgroundTask, run_background
+from starlette.datastructures import Headers
+from starlette.middleware.base import DispatchFunction, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class DispatchMiddleware:
+    """
+    A lighter weight alternative to `BaseHTTPMiddleware`, with the same
+    `dispatch(request, call_next)` interface.
+
+    `call_next()` runs the rest of the application in the same task, instead
+    of in a task group connected by a memory stream. Responses with a single
+    body, or with a `Content-Length` of at most `max_buffer_size` bytes, are
+    held back and returned from `call_next()`. Other streaming responses are
+    sent on to the client as soon as their first chunk is ready.
+    """
+
+    max_buffer_size = 1024 * 1024
+
+    def __init__(
+        self, app: ASGIApp, dispatch: typing.Optional[DispatchFunction] = None
+    ) -> None:
+        self.app = app
+        self.dispatch_func = self.dispatch if dispatch is None else dispatch
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        # Background tasks of the application's response are collected here,
+        # so they don't run until the response has been sent.
+        deferred: typing.List[BackgroundTask] = []
+        intercepted: typing.Optional[_InterceptedResponse] = None
+
+        async def call_next(request: Request) -> Response:
+            nonlocal intercepted
+            interceptor = _ResponseInterceptor(send, self.max_buffer_size)
+            outer_deferred = scope.get("starlette.deferred_background")
+            scope["starlette.deferred_background"] = deferred
+            try:
+                await self.app(scope, replay_receive(request, receive), interceptor)
+            finally:
+                if outer_deferred is None:
+                    del scope["starlette.deferred_background"]
+                else:
+                    scope["starlette.deferred_background"] = outer_deferred
+            intercepted = interceptor.response(deferred)
+            return intercepted
+
+        response = await self.dispatch_func(request, call_next)
+        if response is intercepted:
+            await response(scope, receive, send)
+            return
+        if intercepted is not None and intercepted.sent:
+            raise RuntimeError(
+                "The streaming response from call_next() has already been "
+                "sent, so dispatch() can't return a different response."
+            )
+        await response(scope, receive, send)
+        for background in deferred:
+            await run_background(background, scope)
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        raise NotImplementedError()  # pragma: no cover
+
+
+def replay_receive(request: Request, receive: Receive) -> Receive:
+    """
+    Return a `receive` for the rest of the application, that first replays
+    the request body if `dispatch()` has already read it.
+    """
+    replayed = False
+
+    async def wrapped_receive() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            body = getattr(request, "_body", None)
+            if body is not None:
+                return {"type": "http.request", "body": body, "more_body": False}
+            if request._stream_consumed:
+                return {"type": "http.request", "body": b"", "more_body": False}
+        return await receive()
+
+    return wrapped_receive
+
+
+class _ResponseInterceptor:
+    def __init__(self, send: Send, max_buffer_size: int) -> None:
+        self.send = send
+        self.max_buffer_size = max_buffer_size
+        self.debug: typing.Optional[Message] = None
+        self.start: typing.Optional[Message] = None
+        self.messages: typing.List[Message] = []
+        self.buffered = False
+        self.streaming = False
+
+    async def __call__(self, message: Message) -> None:
+        message_type = message["type"]
+        if self.streaming:
+            await self.send(message)
+        elif message_type == "http.response.debug":
+            self.debug = message
+        elif message_type == "http.response.start":
+            self.start = message
+            content_length = Headers(raw=message.get("headers", [])).get(
+                "content-length"
+            )
+            self.buffered = (
+                content_length is not None
+                and content_length.isdigit()
+                and int(content_length) <= self.max_buffer_size
+            )
+        elif message_type in ("http.response.body", "http.response.trailers"):
+            body = message.get("body")
+            if body is not None and not isinstance(body, bytes):
+                # Buffers may be reused by their owner once `send()` returns.
+                message = {**message, "body": bytes(body)}
+            self.messages.append(message)
+            if (
+                message_type == "http.response.body"
+                and message.get("more_body", False)
+                and not self.buffered
+            ):
+                # Waiting for the rest of a streaming response could take
+                # forever, so send it as it is.
+                self.streaming = True
+                if self.debug is not None:
+                    await self.send(self.debug)
+                await self.send(typing.cast(Message, self.start))
+                for message in self.messages:
+                    await self.send(message)
+        else:
+            # Early hints and server push aren't part of the response, so
+            # there's no reason to hold them back.
+            await self.send(message)
+
+    def response(self, deferred: typing.List[BackgroundTask]) -> "_InterceptedResponse":
+        if self.start is None:
+            raise RuntimeError("No response returned.")
+        return _InterceptedResponse(
+            self.start, self.messages, self.debug, deferred, sent=self.streaming
+        )
+
+
+class _InterceptedResponse(Response):
+    def __init__(
+        self,
+        start: Message,
+        messages: typing.List[Message],
+        debug: typing.Optional[Message],
+        deferred: typing.List[BackgroundTask],
+        sent: bool,
+    ) -> None:
+        self.start = start
+        self.debug = debug
+        self.deferred = deferred
+        self.sent = sent
+        self.status_code = start["status"]
+        self.raw_headers = list(start.get("headers", []))
+        self.body = b"".join(
+            message.get("body", b"")
+            for message in messages
+            if message["type"] == "http.response.body"
+        )
+        self.trailers = [
+            message for message in messages if message["type"] != "http.response.body"
+        ]
+        self.background: typing.Optional[BackgroundTask] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.sent:
+            if self.debug is not None:
+                await send(self.debug)
+            await send(
+                {**self.start, "status": self.status_code, "headers": self.raw_headers}
+            )
+            await send({"type": "http.response.body", "body": self.body})
+            for message in self.trailers:
+                await send(message)
+        elif self.status_code != self.start["status"] or self.raw_headers != list(
+            self.start.get("headers", [])
+        ):
+            raise RuntimeError(
+                "The streaming response from call_next() has already been sent, "
+                "so dispatch() can't change its status code or headers."
+            )
+        for background in self.deferred:
+            await run_background(background, scope)
+        if self.background is not None:
+            await run_background(self.background, scope)
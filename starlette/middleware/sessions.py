@@ -2,11 +2,19 @@ import json
 import typing
 from base64 import b64decode, b64encode
 
+import anyio
 import itsdangerous
 from itsdangerous.exc import BadSignature
 
 from starlette.datastructures import MutableHeaders, Secret
 from starlette.requests import HTTPConnection
+from starlette.sessions import (
+    Session,
+    SessionData,
+    SessionStore,
+    generate_session_id,
+    is_valid_session_id,
+)
 from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
@@ -20,6 +28,8 @@ class SessionMiddleware:
         path: str = "/",
         same_site: typing.Literal["lax", "strict", "none"] = "lax",
         https_only: bool = False,
+        store: typing.Optional[SessionStore] = None,
+        refresh_interval: typing.Optional[int] = 60 * 60,  # 1 hour, in seconds
     ) -> None:
         self.app = app
         self.signer = itsdangerous.TimestampSigner(str(secret_key))
@@ -29,52 +39,162 @@ class SessionMiddleware:
         self.security_flags = "httponly; samesite=" + same_site
         if https_only:  # Secure flag can be used with HTTPS only
             self.security_flags += "; secure"
+        self.store = store
+        self.refresh_interval = refresh_interval
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] not in ("http", "websocket"):  # pragma: no cover
             await self.app(scope, receive, send)
             return
 
+        if self.store is not None:
+            await self.call_with_store(self.store, scope, receive, send)
+            return
+
         connection = HTTPConnection(scope)
         initial_session_was_empty = True
+        initial_payload = b""
+        needs_refresh = False
 
         if self.session_cookie in connection.cookies:
             data = connection.cookies[self.session_cookie].encode("utf-8")
             try:
-                data = self.signer.unsign(data, max_age=self.max_age)
-                scope["session"] = json.loads(b64decode(data))
+                data, signed_at = self.signer.unsign(
+                    data, max_age=self.max_age, return_timestamp=True
+                )
+                initial_payload = b64decode(data)
+                scope["session"] = Session(json.loads(initial_payload))
                 initial_session_was_empty = False
+                age = self.signer.get_timestamp() - signed_at.timestamp()
+                needs_refresh = (
+                    self.refresh_interval is not None and age >= self.refresh_interval
+                )
             except BadSignature:
-                scope["session"] = {}
+                scope["session"] = Session()
         else:
-            scope["session"] = {}
+            scope["session"] = Session()
 
         async def send_wrapper(message: Message) -> None:
             if message["type"] == "http.response.start":
-                if scope["session"]:
-                    # We have session data to persist.
-                    data = b64encode(json.dumps(scope["session"]).encode("utf-8"))
-                    data = self.signer.sign(data)
-                    headers = MutableHeaders(scope=message)
-                    header_value = "{session_cookie}={data}; path={path}; {max_age}{security_flags}".format(  # noqa E501
-                        session_cookie=self.session_cookie,
-                        data=data.decode("utf-8"),
-                        path=self.path,
-                        max_age=f"Max-Age={self.max_age}; " if self.max_age else "",
-                        security_flags=self.security_flags,
-                    )
-                    headers.append("Set-Cookie", header_value)
+                session = scope["session"]
+                if session:
+                    # Comparing with the cookie's payload notices changes made
+                    # anywhere in the session, including inside its values.
+                    payload = json.dumps(session).encode("utf-8")
+                    if payload != initial_payload or needs_refresh:
+                        # We have new session data to persist, or the cookie is
+                        # due to be refreshed so it doesn't expire while in use.
+                        data = self.signer.sign(b64encode(payload))
+                        self.set_cookie(message, data.decode("utf-8"))
                 elif not initial_session_was_empty:
                     # The session has been cleared.
-                    headers = MutableHeaders(scope=message)
-                    header_value = "{session_cookie}={data}; path={path}; {expires}{security_flags}".format(  # noqa E501
-                        session_cookie=self.session_cookie,
-                        data="null",
-                        path=self.path,
-                        expires="expires=Thu, 01 Jan 1970 00:00:00 GMT; ",
-                        security_flags=self.security_flags,
+                    self.expire_cookie(message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def call_with_store(
+        self, store: SessionStore, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        connection = HTTPConnection(scope)
+        session_id: typing.Optional[str] = None
+        needs_refresh = False
+
+        if self.session_cookie in connection.cookies:
+            # The session ID is signed too, which gives it the same timestamp
+            # as a cookie session, so store sessions are refreshed alike.
+            data = connection.cookies[self.session_cookie].encode("utf-8")
+            try:
+                data, signed_at = self.signer.unsign(
+                    data, max_age=self.max_age, return_timestamp=True
+                )
+            except BadSignature:
+                pass
+            else:
+                value = data.decode("utf-8")
+                if is_valid_session_id(value):
+                    session_id = value
+                    age = self.signer.get_timestamp() - signed_at.timestamp()
+                    needs_refresh = (
+                        self.refresh_interval is not None
+                        and age >= self.refresh_interval
+                    )
+        had_cookie = session_id is not None
+        initial_payload = "{}"
+
+        def load() -> typing.Optional[SessionData]:
+            nonlocal session_id, initial_payload
+            data = store.load(typing.cast(str, session_id))
+            if data is None:
+                # Unknown or expired. Never adopt a session ID chosen by the
+                # client, so a new one is issued if the session is saved.
+                session_id = None
+            else:
+                initial_payload = json.dumps(data)
+            return data
+
+        async def call_store(
+            func: typing.Callable[..., typing.Any], *args: typing.Any
+        ) -> None:
+            if store.blocking:
+                await anyio.to_thread.run_sync(func, *args)
+            else:
+                func(*args)
+
+        session = Session(loader=load if had_cookie else None)
+        if had_cookie and store.blocking:
+            # `request.session` can't wait for the store, so blocking stores
+            # are read up front, in the threadpool, rather than on the event
+            # loop. Requests without a session cookie still don't read them.
+            await anyio.to_thread.run_sync(session.load)
+        # Otherwise, the store is only read if the application uses the session.
+        scope["session"] = session
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                session: Session = scope["session"]
+                if needs_refresh and not session.loaded:
+                    # The session is saved again to extend its expiry, even if
+                    # the application didn't use it.
+                    await call_store(session.load)
+                changed = session.loaded and json.dumps(session) != initial_payload
+                if session and (changed or needs_refresh):
+                    if session_id is None:
+                        session_id = generate_session_id()
+                    await call_store(
+                        store.save, session_id, dict(session), self.max_age
+                    )
+                    self.set_cookie(
+                        message, self.signer.sign(session_id).decode("utf-8")
                     )
-                    headers.append("Set-Cookie", header_value)
+                elif not session and changed and had_cookie:
+                    # The session has been cleared.
+                    if session_id is not None:
+                        await call_store(store.delete, session_id)
+                    self.expire_cookie(message)
             await send(message)
 
         await self.app(scope, receive, send_wrapper)
+
+    def set_cookie(self, message: Message, data: str) -> None:
+        headers = MutableHeaders(scope=message)
+        header_value = "{session_cookie}={data}; path={path}; {max_age}{security_flags}".format(  # noqa E501
+            session_cookie=self.session_cookie,
+            data=data,
+            path=self.path,
+            max_age=f"Max-Age={self.max_age}; " if self.max_age else "",
+            security_flags=self.security_flags,
+        )
+        headers.append("Set-Cookie", header_value)
+
+    def expire_cookie(self, message: Message) -> None:
+        headers = MutableHeaders(scope=message)
+        header_value = "{session_cookie}={data}; path={path}; {expires}{security_flags}".format(  # noqa E501
+            session_cookie=self.session_cookie,
+            data="null",
+            path=self.path,
+            expires="expires=Thu, 01 Jan 1970 00:00:00 GMT; ",
+            security_flags=self.security_flags,
+        )
+        headers.append("Set-Cookie", header_value)
@@ -8,6 +8,7 @@ from starlette._utils import AwaitableOrContextManager, AwaitableOrContextManage
 from starlette.datastructures import URL, Address, FormData, Headers, QueryParams, State
 from starlette.exceptions import HTTPException
 from starlette.formparsers import FormParser, MultiPartException, MultiPartParser
+from starlette.sessions import Session
 from starlette.types import Message, Receive, Scope, Send
 
 try:
@@ -147,7 +148,10 @@ class HTTPConnection(typing.Mapping[str, typing.Any]):
         assert (
             "session" in self.scope
         ), "SessionMiddleware must be installed to access request.session"
-        return self.scope["session"]  # type: ignore[no-any-return]
+        session = self.scope["session"]
+        if isinstance(session, Session):
+            session.load()
+        return session  # type: ignore[no-any-return]
 
     @property
     def auth(self) -> typing.Any:
@@ -315,3 +319,12 @@ class Request(HTTPConnection):
             await self._send(
                 {"type": "http.response.push", "path": path, "headers": raw_headers}
             )
+
+    async def send_early_hints(self, links: typing.Sequence[str]) -> None:
+        if "http.response.early_hint" in self.scope.get("extensions", {}):
+            await self._send(
+                {
+                    "type": "http.response.early_hint",
+                    "links": [link.encode("latin-1") for link in links],
+                }
+            )
@@ -1,21 +1,108 @@
+import base64
+import hashlib
 import http.cookies
+import io
 import json
 import os
+import re
 import stat
+import struct
+import tarfile
+import time
 import typing
+import zlib
 from datetime import datetime
-from email.utils import format_datetime, formatdate
+from email.utils import format_datetime, formatdate, parsedate
 from functools import partial
 from mimetypes import guess_type
 from urllib.parse import quote
 
 import anyio
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 
 from starlette._compat import md5_hexdigest
-from starlette.background import BackgroundTask
+from starlette.background import BackgroundTask, run_background
 from starlette.concurrency import iterate_in_threadpool
-from starlette.datastructures import URL, MutableHeaders
-from starlette.types import Receive, Scope, Send
+from starlette.datastructures import URL, Headers, MutableHeaders
+from starlette.types import Message, Receive, Scope, Send
+
+
+class Checksum:
+    """
+    A running digest of a response body, for the `Content-Digest` trailer.
+    """
+
+    algorithms = ("crc32", "sha-256", "sha-512")
+
+    def __init__(self, algorithm: str) -> None:
+        assert (
+            algorithm in self.algorithms
+        ), f"checksum must be one of {', '.join(self.algorithms)}"
+        self.algorithm = algorithm
+        self.crc = 0
+        self.hash = (
+            None if algorithm == "crc32" else hashlib.new(algorithm.replace("-", ""))
+        )
+
+    def update(self, data: bytes) -> None:
+        if self.hash is None:
+            self.crc = zlib.crc32(data, self.crc)
+        else:
+            self.hash.update(data)
+
+    def digest(self) -> bytes:
+        if self.hash is None:
+            return self.crc.to_bytes(4, "big")
+        return self.hash.digest()
+
+    def header(self) -> typing.Tuple[bytes, bytes]:
+        value = base64.b64encode(self.digest()).decode("ascii")
+        return (b"content-digest", f"{self.algorithm}=:{value}:".encode("latin-1"))
+
+
+def send_with_checksum(
+    send: Send, algorithm: str, threadpool_minimum_size: int = 128 * 1024
+) -> Send:
+    """
+    Wrap `send` so that a checksum of the response body is sent as a
+    `Content-Digest` trailer, using the ASGI `http.response.trailers` extension.
+
+    Body chunks of at least `threadpool_minimum_size` bytes are hashed in the
+    threadpool, so they don't block the event loop.
+    """
+    checksum = Checksum(algorithm)
+
+    async def wrapper(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = MutableHeaders(raw=list(message["headers"]))
+            headers["trailer"] = "content-digest"
+            message = {**message, "headers": headers.raw, "trailers": True}
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if len(body) >= threadpool_minimum_size:
+                await anyio.to_thread.run_sync(checksum.update, body)
+            else:
+                checksum.update(body)
+            if not message.get("more_body", False):
+                await send(message)
+                await send(
+                    {
+                        "type": "http.response.trailers",
+                        "headers": [checksum.header()],
+                        "more_trailers": False,
+                    }
+                )
+                return
+        await send(message)
+
+    return wrapper
+
+
+def supports_trailers(scope: Scope) -> bool:
+    return (
+        "http.response.trailers" in scope.get("extensions", {})
+        and scope.get("method") != "HEAD"
+    )
 
 
 class Response:
@@ -37,12 +124,18 @@ class Response:
         self.body = self.render(content)
         self.init_headers(headers)
 
-    def render(self, content: typing.Union[str, bytes, None]) -> bytes:
+    def render(
+        self, content: typing.Union[str, bytes, bytearray, memoryview, None]
+    ) -> typing.Union[bytes, bytearray, memoryview]:
         if content is None:
             return b""
-        if isinstance(content, bytes):
-            return content
-        return content.encode(self.charset)
+        if isinstance(content, str):
+            return content.encode(self.charset)
+        if isinstance(content, memoryview):
+            # Buffers are sent without copying, but `Content-Length` must
+            # count bytes rather than items.
+            return content.cast("B") if content.c_contiguous else content.tobytes()
+        return content
 
     def init_headers(
         self, headers: typing.Optional[typing.Mapping[str, str]] = None
@@ -153,7 +246,7 @@ class Response:
         await send({"type": "http.response.body", "body": self.body})
 
         if self.background is not None:
-            await self.background()
+            await run_background(self.background, scope)
 
 
 class HTMLResponse(Response):
@@ -201,7 +294,65 @@ class RedirectResponse(Response):
         self.headers["location"] = quote(str(url), safe=":/%#?=@[]!$&'()*+,;")
 
 
-Content = typing.Union[str, bytes]
+class ResponseTemplate:
+    """
+    Stamps out responses that share a status code, media type and set of
+    headers, encoding those headers only once.
+
+    Calling the template renders the content and builds the response's raw
+    headers from the pre-encoded ones, the `content-length` and any
+    per-response `headers`.
+    """
+
+    def __init__(
+        self,
+        response_class: typing.Type[Response] = Response,
+        status_code: int = 200,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        media_type: typing.Optional[str] = None,
+    ) -> None:
+        self.response_class = response_class
+        self.status_code = status_code
+        self.media_type = (
+            response_class.media_type if media_type is None else media_type
+        )
+        prototype = response_class.__new__(response_class)
+        prototype.status_code = status_code
+        prototype.media_type = self.media_type
+        prototype.init_headers(headers)
+        self.raw_headers = prototype.raw_headers
+        self.populate_content_length = not (
+            any(key == b"content-length" for key, _ in self.raw_headers)
+            or status_code < 200
+            or status_code in (204, 304)
+        )
+
+    def __call__(
+        self,
+        content: typing.Any = None,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        background: typing.Optional[BackgroundTask] = None,
+    ) -> Response:
+        response = self.response_class.__new__(self.response_class)
+        response.status_code = self.status_code
+        response.media_type = self.media_type
+        response.background = background
+        response.body = response.render(content)
+        raw_headers = self.raw_headers.copy()
+        if self.populate_content_length:
+            raw_headers.append(
+                (b"content-length", str(len(response.body)).encode("latin-1"))
+            )
+        if headers:
+            raw_headers += [
+                (key.lower().encode("latin-1"), value.encode("latin-1"))
+                for key, value in headers.items()
+            ]
+        response.raw_headers = raw_headers
+        return response
+
+
+Content = typing.Union[str, bytes, bytearray, memoryview]
 SyncContentStream = typing.Iterator[Content]
 AsyncContentStream = typing.AsyncIterable[Content]
 ContentStream = typing.Union[AsyncContentStream, SyncContentStream]
@@ -209,6 +360,11 @@ ContentStream = typing.Union[AsyncContentStream, SyncContentStream]
 
 class StreamingResponse(Response):
     body_iterator: AsyncContentStream
+    # Sync iterators are pulled from in the threadpool, one item per trip
+    # unless batching is enabled.
+    threadpool_batch_size = 1
+    threadpool_batch_bytes = 64 * 1024
+    checksum: typing.Optional[str] = None
 
     def __init__(
         self,
@@ -217,14 +373,30 @@ class StreamingResponse(Response):
         headers: typing.Optional[typing.Mapping[str, str]] = None,
         media_type: typing.Optional[str] = None,
         background: typing.Optional[BackgroundTask] = None,
+        buffer_size: typing.Optional[int] = None,
+        buffer_latency: typing.Optional[float] = None,
+        checksum: typing.Optional[str] = None,
+        prefetch: typing.Optional[int] = None,
+        threadpool_batch_size: typing.Optional[int] = None,
     ) -> None:
+        if threadpool_batch_size is not None:
+            self.threadpool_batch_size = threadpool_batch_size
         if isinstance(content, typing.AsyncIterable):
             self.body_iterator = content
         else:
-            self.body_iterator = iterate_in_threadpool(content)
+            self.body_iterator = iterate_in_threadpool(
+                content,
+                batch_size=self.threadpool_batch_size,
+                batch_bytes=self.threadpool_batch_bytes,
+            )
         self.status_code = status_code
         self.media_type = self.media_type if media_type is None else media_type
         self.background = background
+        self.buffer_size = buffer_size
+        self.buffer_latency = buffer_latency
+        self.prefetch = prefetch
+        if checksum is not None:
+            self.checksum = Checksum(checksum).algorithm
         self.init_headers(headers)
 
     async def listen_for_disconnect(self, receive: Receive) -> None:
@@ -241,14 +413,113 @@ class StreamingResponse(Response):
                 "headers": self.raw_headers,
             }
         )
+        if self.prefetch is None:
+            await self.send_body(self.body_iterator, send)
+            return
+
+        send_stream: MemoryObjectSendStream[Content]
+        receive_stream: MemoryObjectReceiveStream[Content]
+        send_stream, receive_stream = anyio.create_memory_object_stream(self.prefetch)
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(self.produce_body, send_stream)
+            with receive_stream:
+                await self.send_body(receive_stream, send)
+
+    async def produce_body(self, stream: MemoryObjectSendStream[Content]) -> None:
+        """
+        Pull chunks from the body iterator while earlier ones are being sent,
+        waiting whenever `prefetch` chunks are already queued.
+        """
         async for chunk in self.body_iterator:
-            if not isinstance(chunk, bytes):
+            await stream.send(chunk)
+        # Only close on success, so that an error in the body iterator isn't
+        # mistaken for the end of the body.
+        stream.close()
+
+    async def send_body(self, chunks: AsyncContentStream, send: Send) -> None:
+        if self.buffer_size is not None and self.media_type != "text/event-stream":
+            await self.stream_buffered(chunks, send, self.buffer_size)
+            return
+
+        async for chunk in chunks:
+            if isinstance(chunk, str):
                 chunk = chunk.encode(self.charset)
             await send({"type": "http.response.body", "body": chunk, "more_body": True})
 
         await send({"type": "http.response.body", "body": b"", "more_body": False})
 
+    async def stream_buffered(
+        self, chunks: AsyncContentStream, send: Send, buffer_size: int
+    ) -> None:
+        """
+        Coalesce `chunks` from the body iterator, sending them once at least
+        `buffer_size` bytes are pending, or every `buffer_latency` seconds.
+        Consecutive `str` chunks are joined and encoded in a single call.
+        """
+        pending: typing.List[typing.Union[bytes, bytearray, memoryview]] = []
+        pending_text: typing.List[str] = []
+        pending_size = 0
+        lock = anyio.Lock()
+
+        def collect() -> bytes:
+            nonlocal pending_size
+            if pending_text:
+                pending.append("".join(pending_text).encode(self.charset))
+                pending_text.clear()
+            body = b"".join(pending)
+            pending.clear()
+            pending_size = 0
+            return body
+
+        async def flush_periodically(latency: float) -> None:
+            while True:
+                await anyio.sleep(latency)
+                async with lock:
+                    if pending_size:
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": collect(),
+                                "more_body": True,
+                            }
+                        )
+
+        async with anyio.create_task_group() as task_group:
+            if self.buffer_latency is not None:
+                task_group.start_soon(flush_periodically, self.buffer_latency)
+
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    pending_text.append(chunk)
+                else:
+                    if pending_text:
+                        pending.append("".join(pending_text).encode(self.charset))
+                        pending_text.clear()
+                    pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= buffer_size:
+                    async with lock:
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": collect(),
+                                "more_body": True,
+                            }
+                        )
+
+            # Holding the lock guarantees the flusher isn't part-way through
+            # a send when it gets cancelled.
+            async with lock:
+                task_group.cancel_scope.cancel()
+
+        await send(
+            {"type": "http.response.body", "body": collect(), "more_body": False}
+        )
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.checksum is not None and supports_trailers(scope):
+            send = send_with_checksum(send, self.checksum)
+
         async with anyio.create_task_group() as task_group:
 
             async def wrap(func: "typing.Callable[[], typing.Awaitable[None]]") -> None:
@@ -259,11 +530,431 @@ class StreamingResponse(Response):
             await wrap(partial(self.listen_for_disconnect, receive))
 
         if self.background is not None:
-            await self.background()
+            await run_background(self.background, scope)
+
+
+class _ChunkWriter:
+    """
+    Joins small string pieces into chunks of at least `chunk_size` characters.
+    """
+
+    def __init__(self, chunk_size: int, charset: str) -> None:
+        self.chunk_size = chunk_size
+        self.charset = charset
+        self.pieces: typing.List[str] = []
+        self.size = 0
+
+    def write(self, piece: str) -> typing.Optional[bytes]:
+        self.pieces.append(piece)
+        self.size += len(piece)
+        if self.size >= self.chunk_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes:
+        chunk = "".join(self.pieces).encode(self.charset)
+        self.pieces.clear()
+        self.size = 0
+        return chunk
+
+
+class StreamingJSONResponse(StreamingResponse):
+    """
+    Incrementally encodes the items of an iterable, or async iterable, as the
+    elements of a JSON array, or as newline delimited JSON with `ndjson=True`.
+
+    Each item is encoded in one go, with the C accelerated `JSONEncoder.encode`,
+    and written out in chunks of about `chunk_size` bytes, so memory use is
+    bounded by the chunk size and the size of a single item, rather than that
+    of the whole document.
+    Sync iterables are consumed and encoded in the threadpool.
+    """
+
+    media_type = "application/json"
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        content: typing.Union[
+            typing.AsyncIterable[typing.Any], typing.Iterable[typing.Any]
+        ],
+        status_code: int = 200,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        media_type: typing.Optional[str] = None,
+        background: typing.Optional[BackgroundTask] = None,
+        ndjson: bool = False,
+    ) -> None:
+        self.ndjson = ndjson
+        self.encoder = json.JSONEncoder(
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+        )
+        if media_type is None and ndjson:
+            media_type = "application/x-ndjson"
+        body_iterator: ContentStream
+        if isinstance(content, typing.AsyncIterable):
+            body_iterator = self.encode_async(content)
+        else:
+            body_iterator = self.encode_sync(content)
+        super().__init__(body_iterator, status_code, headers, media_type, background)
+
+    def encode(self, item: typing.Any, index: int) -> str:
+        if self.ndjson:
+            return self.encoder.encode(item) + "\n"
+        if index:
+            return "," + self.encoder.encode(item)
+        return self.encoder.encode(item)
+
+    def encode_sync(self, items: typing.Iterable[typing.Any]) -> typing.Iterator[bytes]:
+        writer = _ChunkWriter(self.chunk_size, "utf-8")
+        if not self.ndjson:
+            writer.write("[")
+        for index, item in enumerate(items):
+            chunk = writer.write(self.encode(item, index))
+            if chunk is not None:
+                yield chunk
+        if not self.ndjson:
+            writer.write("]")
+        if writer.size:
+            yield writer.flush()
+
+    async def encode_async(
+        self, items: typing.AsyncIterable[typing.Any]
+    ) -> typing.AsyncIterator[bytes]:
+        writer = _ChunkWriter(self.chunk_size, "utf-8")
+        if not self.ndjson:
+            writer.write("[")
+        index = 0
+        async for item in items:
+            chunk = writer.write(self.encode(item, index))
+            if chunk is not None:
+                yield chunk
+            index += 1
+        if not self.ndjson:
+            writer.write("]")
+        if writer.size:
+            yield writer.flush()
+
+
+class ServerSentEvent:
+    """
+    A single Server-Sent Event, framed according to the HTML specification.
+    """
+
+    def __init__(
+        self,
+        data: typing.Optional[str] = None,
+        event: typing.Optional[str] = None,
+        id: typing.Optional[str] = None,
+        retry: typing.Optional[int] = None,
+        comment: typing.Optional[str] = None,
+    ) -> None:
+        for name, value in (("event", event), ("id", id)):
+            if value is not None and ("\n" in value or "\r" in value):
+                raise ValueError(f"Server-Sent Event {name} must be a single line.")
+        self.data = data
+        self.event = event
+        self.id = id
+        self.retry = retry
+        self.comment = comment
+
+    def encode(self, charset: str = "utf-8") -> bytes:
+        lines: typing.List[str] = []
+        if self.comment is not None:
+            lines.extend(": " + line for line in _LINE_BREAK_RE.split(self.comment))
+        if self.id is not None:
+            lines.append("id: " + self.id)
+        if self.event is not None:
+            lines.append("event: " + self.event)
+        if self.data is not None:
+            lines.extend("data: " + line for line in _LINE_BREAK_RE.split(self.data))
+        if self.retry is not None:
+            lines.append("retry: " + str(self.retry))
+        return ("\n".join(lines) + "\n\n").encode(charset)
+
+
+_LINE_BREAK_RE = re.compile(r"\r\n|\r|\n")
+
+Event = typing.Union[ServerSentEvent, str, bytes]
+EventStream = typing.Union[typing.AsyncIterable[Event], typing.Iterable[Event]]
+
+
+class EventSourceResponse(StreamingResponse):
+    """
+    Streams Server-Sent Events.
+
+    The content may yield `ServerSentEvent` instances, strings, which are sent
+    as the `data` of an event, or bytes, which are sent as-is and so must
+    already be framed, for example by `ServerSentEvent.encode()`.
+    """
+
+    media_type = "text/event-stream"
+    ping_message = b": ping\n\n"
+
+    def __init__(
+        self,
+        content: EventStream,
+        status_code: int = 200,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        background: typing.Optional[BackgroundTask] = None,
+        ping_interval: typing.Optional[float] = 15,
+        retry: typing.Optional[int] = None,
+    ) -> None:
+        self.ping_interval = ping_interval
+        self.retry = retry
+        super().__init__(
+            self.encode_events(content),
+            status_code=status_code,
+            headers=headers,
+            background=background,
+        )
+        self.headers.setdefault("cache-control", "no-cache")
+        # Ask reverse proxies such as nginx not to buffer the stream.
+        self.headers.setdefault("x-accel-buffering", "no")
+
+    def encode_event(self, event: Event) -> bytes:
+        if isinstance(event, bytes):
+            return event
+        if isinstance(event, str):
+            event = ServerSentEvent(data=event)
+        return event.encode(self.charset)
+
+    async def encode_events(self, content: EventStream) -> typing.AsyncIterator[bytes]:
+        events: typing.AsyncIterable[Event]
+        if isinstance(content, typing.AsyncIterable):
+            events = content
+        else:
+            events = iterate_in_threadpool(iter(content))
+        async for event in events:
+            yield self.encode_event(event)
+
+    async def stream_response(self, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if self.retry is not None:
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": ServerSentEvent(retry=self.retry).encode(self.charset),
+                    "more_body": True,
+                }
+            )
+
+        lock = anyio.Lock()
+        last_sent = anyio.current_time()
+
+        async def ping(interval: float) -> None:
+            nonlocal last_sent
+            while True:
+                await anyio.sleep(max(0, last_sent + interval - anyio.current_time()))
+                async with lock:
+                    if anyio.current_time() - last_sent >= interval:
+                        await send(
+                            {
+                                "type": "http.response.body",
+                                "body": self.ping_message,
+                                "more_body": True,
+                            }
+                        )
+                        last_sent = anyio.current_time()
+
+        async with anyio.create_task_group() as task_group:
+            if self.ping_interval is not None:
+                task_group.start_soon(ping, self.ping_interval)
+
+            async for body in self.body_iterator:
+                async with lock:
+                    await send(
+                        {"type": "http.response.body", "body": body, "more_body": True}
+                    )
+                    last_sent = anyio.current_time()
+
+            async with lock:
+                task_group.cancel_scope.cancel()
+
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class EventBroadcast:
+    """
+    Fans events out to many `EventSourceResponse` subscribers.
+
+    Each published event is encoded once, and the same bytes are pushed to
+    every subscriber. Subscribers have a bounded buffer of `max_buffer` events,
+    and a subscriber that falls further behind than that is disconnected, so
+    that it can reconnect and catch up using `Last-Event-ID`.
+    """
+
+    def __init__(self, max_buffer: int = 64, charset: str = "utf-8") -> None:
+        self.max_buffer = max_buffer
+        self.charset = charset
+        self.subscribers: typing.Set[MemoryObjectSendStream[bytes]] = set()
+
+    def publish(self, event: typing.Union[ServerSentEvent, str]) -> None:
+        if isinstance(event, str):
+            event = ServerSentEvent(data=event)
+        body = event.encode(self.charset)
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.send_nowait(body)
+            except anyio.WouldBlock:
+                self.subscribers.discard(subscriber)
+                subscriber.close()
+
+    async def subscribe(self) -> typing.AsyncGenerator[bytes, None]:
+        send_stream: MemoryObjectSendStream[bytes]
+        receive_stream: MemoryObjectReceiveStream[bytes]
+        send_stream, receive_stream = anyio.create_memory_object_stream(self.max_buffer)
+        self.subscribers.add(send_stream)
+        try:
+            async with receive_stream:
+                async for body in receive_stream:
+                    yield body
+        finally:
+            self.subscribers.discard(send_stream)
+            send_stream.close()
+
+
+class NotModifiedResponse(Response):
+    NOT_MODIFIED_HEADERS = (
+        "cache-control",
+        "content-location",
+        "date",
+        "etag",
+        "expires",
+        "vary",
+    )
+
+    def __init__(self, headers: Headers):
+        super().__init__(
+            status_code=304,
+            headers={
+                name: value
+                for name, value in headers.items()
+                if name in self.NOT_MODIFIED_HEADERS
+            },
+        )
+
+
+ETAG_RE = re.compile(r'(?:W/)?"[^"]*"|[^\s,]+')
+
+
+def parse_etags(value: str) -> typing.List[str]:
+    """
+    Split an `If-Match` / `If-None-Match` header value into its entity-tags.
+    """
+    return ETAG_RE.findall(value)
+
+
+def etag_matches(etag: str, candidates: typing.List[str], weak: bool) -> bool:
+    """
+    Compare an entity-tag against a list of candidates, using either the weak
+    or the strong comparison function from RFC 9110, section 8.8.3.2.
+    """
+    if "*" in candidates:
+        return True
+    if weak:
+        etag = etag[2:] if etag.startswith("W/") else etag
+        return any(
+            (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+            for candidate in candidates
+        )
+    if etag.startswith("W/"):
+        return False
+    return etag in candidates
+
+
+def _is_modified_since(response_headers: Headers, since: str) -> typing.Optional[bool]:
+    since_date = parsedate(since)
+    last_modified = response_headers.get("last-modified")
+    if since_date is None or last_modified is None:
+        return None
+    last_modified_date = parsedate(last_modified)
+    if last_modified_date is None:
+        return None
+    return last_modified_date[:6] > since_date[:6]
+
+
+def evaluate_preconditions(
+    request_headers: Headers, response_headers: Headers, method: str = "GET"
+) -> typing.Optional[int]:
+    """
+    Evaluate the request preconditions against the `ETag` and `Last-Modified`
+    response headers, in the order given by RFC 9110, section 13.2.2.
+
+    Returns `304` or `412` if the response should be replaced with a
+    "Not Modified" or "Precondition Failed" response, or `None` otherwise.
+    """
+    etag = response_headers.get("etag")
+
+    if_match = request_headers.get("if-match")
+    if if_match is not None:
+        if etag is None or not etag_matches(etag, parse_etags(if_match), weak=False):
+            return 412
+    else:
+        if_unmodified_since = request_headers.get("if-unmodified-since")
+        if if_unmodified_since is not None:
+            if _is_modified_since(response_headers, if_unmodified_since):
+                return 412
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is not None and etag_matches(
+            etag, parse_etags(if_none_match), weak=True
+        ):
+            return 304 if method in ("GET", "HEAD") else 412
+    elif method in ("GET", "HEAD"):
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is not None:
+            if _is_modified_since(response_headers, if_modified_since) is False:
+                return 304
+
+    return None
+
+
+def precondition_response(
+    scope: Scope, response_headers: Headers
+) -> typing.Optional[Response]:
+    """
+    Return a "Not Modified" or "Precondition Failed" response to send instead of
+    a representation with the given headers, if the request calls for one.
+    """
+    if "headers" not in scope:
+        return None
+    status_code = evaluate_preconditions(
+        Headers(scope=scope), response_headers, scope.get("method", "GET")
+    )
+    if status_code == 304:
+        return NotModifiedResponse(response_headers)
+    if status_code is not None:
+        return Response(status_code=status_code)
+    return None
+
+
+def build_content_disposition(content_disposition_type: str, filename: str) -> str:
+    content_disposition_filename = quote(filename)
+    if content_disposition_filename != filename:
+        return "{}; filename*=utf-8''{}".format(
+            content_disposition_type, content_disposition_filename
+        )
+    return '{}; filename="{}"'.format(content_disposition_type, filename)
 
 
 class FileResponse(Response):
     chunk_size = 64 * 1024
+    max_chunk_size = 1024 * 1024
+    # Read into a single reused buffer and send `memoryview` slices of it,
+    # rather than allocating a new `bytes` object per chunk. Only enable this
+    # for servers that accept buffer objects as bodies, and that have finished
+    # with each body by the time `send()` returns.
+    reuse_buffer = False
 
     def __init__(
         self,
@@ -276,8 +967,10 @@ class FileResponse(Response):
         stat_result: typing.Optional[os.stat_result] = None,
         method: typing.Optional[str] = None,
         content_disposition_type: str = "attachment",
+        checksum: typing.Optional[str] = None,
     ) -> None:
         self.path = path
+        self.checksum = None if checksum is None else Checksum(checksum).algorithm
         self.status_code = status_code
         self.filename = filename
         self.send_header_only = method is not None and method.upper() == "HEAD"
@@ -287,15 +980,9 @@ class FileResponse(Response):
         self.background = background
         self.init_headers(headers)
         if self.filename is not None:
-            content_disposition_filename = quote(self.filename)
-            if content_disposition_filename != self.filename:
-                content_disposition = "{}; filename*=utf-8''{}".format(
-                    content_disposition_type, content_disposition_filename
-                )
-            else:
-                content_disposition = '{}; filename="{}"'.format(
-                    content_disposition_type, self.filename
-                )
+            content_disposition = build_content_disposition(
+                content_disposition_type, self.filename
+            )
             self.headers.setdefault("content-disposition", content_disposition)
         self.stat_result = stat_result
         if stat_result is not None:
@@ -305,12 +992,56 @@ class FileResponse(Response):
         content_length = str(stat_result.st_size)
         last_modified = formatdate(stat_result.st_mtime, usegmt=True)
         etag_base = str(stat_result.st_mtime) + "-" + str(stat_result.st_size)
-        etag = md5_hexdigest(etag_base.encode(), usedforsecurity=False)
+        etag = f'"{md5_hexdigest(etag_base.encode(), usedforsecurity=False)}"'
 
         self.headers.setdefault("content-length", content_length)
         self.headers.setdefault("last-modified", last_modified)
         self.headers.setdefault("etag", etag)
 
+    async def send_file(
+        self, file: "anyio.AsyncFile[bytes]", file_size: int, send: Send
+    ) -> None:
+        # Drive the loop from the known file size, so that the final chunk is
+        # sent with `more_body=False` instead of following it with an empty one.
+        remaining = file_size
+        if remaining == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        chunk_size = self.get_chunk_size(file_size)
+        if self.reuse_buffer:
+            buffer = memoryview(bytearray(min(chunk_size, remaining)))
+        while remaining > 0:
+            chunk: typing.Union[bytes, memoryview]
+            if self.reuse_buffer:
+                size = await anyio.to_thread.run_sync(
+                    typing.cast(io.BufferedReader, file.wrapped).readinto,
+                    buffer[: min(chunk_size, remaining)],
+                )
+                chunk = buffer[:size]
+            else:
+                chunk = await file.read(min(chunk_size, remaining))
+                size = len(chunk)
+            # Stop early if the file was truncated while we were reading it.
+            remaining = remaining - size if size else 0
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                }
+            )
+
+    def get_chunk_size(self, file_size: int) -> int:
+        """
+        Scale the chunk size up with the file size, so that large files are
+        sent in fewer, larger chunks.
+        """
+        chunk_size = self.chunk_size
+        while chunk_size * 2 <= self.max_chunk_size and file_size > chunk_size * 64:
+            chunk_size *= 2
+        return chunk_size
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if self.stat_result is None:
             try:
@@ -322,6 +1053,16 @@ class FileResponse(Response):
                 mode = stat_result.st_mode
                 if not stat.S_ISREG(mode):
                     raise RuntimeError(f"File at path {self.path} is not a file.")
+                self.stat_result = stat_result
+        if self.status_code == 200:
+            response = precondition_response(scope, self.headers)
+            if response is not None:
+                await response(scope, receive, send)
+                if self.background is not None:
+                    await run_background(self.background, scope)
+                return
+        if self.checksum is not None and supports_trailers(scope):
+            send = send_with_checksum(send, self.checksum)
         await send(
             {
                 "type": "http.response.start",
@@ -333,16 +1074,356 @@ class FileResponse(Response):
             await send({"type": "http.response.body", "body": b"", "more_body": False})
         else:
             async with await anyio.open_file(self.path, mode="rb") as file:
-                more_body = True
-                while more_body:
-                    chunk = await file.read(self.chunk_size)
-                    more_body = len(chunk) == self.chunk_size
+                await self.send_file(file, self.stat_result.st_size, send)
+        if self.background is not None:
+            await run_background(self.background, scope)
+
+
+ArchiveContent = typing.Union[typing.AsyncIterable[bytes], typing.Iterable[bytes]]
+
+
+class ArchiveEntry:
+    """
+    A single member of an `ArchiveResponse`, read either from a file `path` or
+    from an iterable of byte chunks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: typing.Optional[typing.Union[str, "os.PathLike[str]"]] = None,
+        content: typing.Optional[ArchiveContent] = None,
+        size: typing.Optional[int] = None,
+        mtime: typing.Optional[float] = None,
+        mode: int = 0o644,
+    ) -> None:
+        assert (path is None) != (
+            content is None
+        ), "Archive entries need exactly one of 'path' or 'content'"
+        self.name = name
+        self.path = path
+        self.content = content
+        self.size = size
+        self.mtime = time.time() if mtime is None and path is None else mtime
+        self.mode = mode
+
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_ZIP_DATA_DESCRIPTOR = struct.Struct("<4s3L")
+_ZIP_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_ZIP_END_RECORD = struct.Struct("<4s4H2LH")
+# Sizes, CRCs and lengths follow the data, and names are UTF-8.
+_ZIP_FLAGS = 0x08 | 0x800
+_ZIP_LIMIT = 0xFFFFFFFF
+_ZIP_STORED = 0
+
+
+def _dos_datetime(timestamp: float) -> typing.Tuple[int, int]:
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    dos_time = hour << 11 | minute << 5 | second // 2
+    dos_date = (year - 1980) << 9 | month << 5 | day
+    return dos_time, dos_date
+
+
+class _ArchiveEntryWriter:
+    """
+    Counts, checksums and optionally compresses the data of one archive entry.
+    """
+
+    def __init__(
+        self,
+        checksum: bool = False,
+        compressor: typing.Optional["zlib._Compress"] = None,
+    ) -> None:
+        self.checksum = checksum
+        self.compressor = compressor
+        self.crc = self.size = self.compressed_size = 0
+
+    def write(self, chunk: bytes) -> bytes:
+        self.size += len(chunk)
+        if self.checksum:
+            self.crc = zlib.crc32(chunk, self.crc)
+        if self.compressor is not None:
+            chunk = self.compressor.compress(chunk)
+        self.compressed_size += len(chunk)
+        return chunk
+
+    def flush(self) -> bytes:
+        if self.compressor is None:
+            return b""
+        chunk = self.compressor.flush()
+        self.compressed_size += len(chunk)
+        return chunk
+
+    def read(self, file: typing.BinaryIO, size: int) -> typing.Optional[bytes]:
+        chunk = file.read(size)
+        return self.write(chunk) if chunk else None
+
+
+class ArchiveResponse(Response):
+    """
+    Streams a ZIP or TAR archive of many files, without building it first.
+    """
+
+    chunk_size = 64 * 1024
+    # Chunks from `content` that are at least this large are checksummed and
+    # compressed in the threadpool. File chunks always are, as they are read.
+    threadpool_minimum_size = 64 * 1024
+
+    def __init__(
+        self,
+        entries: typing.Sequence[typing.Union[str, "os.PathLike[str]", ArchiveEntry]],
+        status_code: int = 200,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        media_type: typing.Optional[str] = None,
+        background: typing.Optional[BackgroundTask] = None,
+        filename: typing.Optional[str] = None,
+        method: typing.Optional[str] = None,
+        archive_format: str = "zip",
+        compression: str = "stored",
+        compresslevel: int = 6,
+    ) -> None:
+        assert archive_format in ("zip", "tar"), "archive_format must be zip or tar"
+        assert compression in (
+            "stored",
+            "deflate",
+        ), "compression must be stored or deflate"
+        assert (
+            archive_format == "zip" or compression == "stored"
+        ), "TAR archives can't be compressed"
+        self.entries = [
+            entry
+            if isinstance(entry, ArchiveEntry)
+            else ArchiveEntry(os.path.basename(entry), path=entry)
+            for entry in entries
+        ]
+        assert archive_format == "zip" or all(
+            entry.path is not None or entry.size is not None for entry in self.entries
+        ), "TAR entries read from 'content' need a 'size'"
+        self.archive_format = archive_format
+        self.compression = compression
+        self.compresslevel = compresslevel
+        self.status_code = status_code
+        self.send_header_only = method is not None and method.upper() == "HEAD"
+        if media_type is None:
+            media_type = (
+                "application/zip" if archive_format == "zip" else "application/x-tar"
+            )
+        self.media_type = media_type
+        self.background = background
+        self.init_headers(headers)
+        if filename is not None:
+            content_disposition = build_content_disposition("attachment", filename)
+            self.headers.setdefault("content-disposition", content_disposition)
+
+    def stat_entries(self) -> None:
+        for entry in self.entries:
+            if entry.path is None:
+                continue
+            try:
+                stat_result = os.stat(entry.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {entry.path} does not exist.")
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError(f"File at path {entry.path} is not a file.")
+            entry.size = stat_result.st_size
+            entry.mtime = stat_result.st_mtime
+            entry.mode = stat.S_IMODE(stat_result.st_mode)
+
+    def get_content_length(self) -> typing.Optional[int]:
+        if self.compression != "stored":
+            return None
+        content_length = 0
+        for entry in self.entries:
+            if entry.size is None:
+                return None
+            content_length += entry.size
+            if self.archive_format == "tar":
+                content_length += len(self.tar_header(entry)) + -entry.size % 512
+            else:
+                content_length += (
+                    _ZIP_LOCAL_HEADER.size
+                    + _ZIP_DATA_DESCRIPTOR.size
+                    + _ZIP_CENTRAL_HEADER.size
+                    + 2 * len(entry.name.encode("utf-8"))
+                )
+        if self.archive_format == "tar":
+            return content_length + 1024
+        return content_length + _ZIP_END_RECORD.size
+
+    async def iter_entry(
+        self, entry: ArchiveEntry, writer: _ArchiveEntryWriter
+    ) -> typing.AsyncIterator[bytes]:
+        if entry.path is not None:
+            async with await anyio.open_file(entry.path, mode="rb") as file:
+                while True:
+                    # Read and process each chunk in a single threadpool hop.
+                    chunk = await anyio.to_thread.run_sync(
+                        writer.read, file.wrapped, self.chunk_size
+                    )
+                    if chunk is None:
+                        break
+                    yield chunk
+            return
+
+        content = typing.cast(ArchiveContent, entry.content)
+        chunks: typing.AsyncIterable[bytes]
+        if isinstance(content, typing.AsyncIterable):
+            chunks = content
+        else:
+            chunks = iterate_in_threadpool(iter(content))
+        async for chunk in chunks:
+            if len(chunk) >= self.threadpool_minimum_size:
+                yield await anyio.to_thread.run_sync(writer.write, chunk)
+            else:
+                yield writer.write(chunk)
+
+    async def iter_zip(self) -> typing.AsyncIterator[bytes]:
+        method = zlib.DEFLATED if self.compression == "deflate" else _ZIP_STORED
+        offset = 0
+        central_directory = []
+        for entry in self.entries:
+            name = entry.name.encode("utf-8")
+            dos_time, dos_date = _dos_datetime(typing.cast(float, entry.mtime))
+            header = _ZIP_LOCAL_HEADER.pack(
+                b"PK\x03\x04",
+                20,
+                _ZIP_FLAGS,
+                method,
+                dos_time,
+                dos_date,
+                0,
+                0,
+                0,
+                len(name),
+                0,
+            )
+            yield header + name
+
+            writer = _ArchiveEntryWriter(
+                checksum=True,
+                compressor=(
+                    zlib.compressobj(self.compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+                    if method == zlib.DEFLATED
+                    else None
+                ),
+            )
+            async for chunk in self.iter_entry(entry, writer):
+                yield chunk
+            yield writer.flush()
+            crc, size, compressed_size = writer.crc, writer.size, writer.compressed_size
+            self.check_size(entry, size)
+
+            if max(size, compressed_size, offset) > _ZIP_LIMIT:
+                raise RuntimeError("Archive is too large for ZIP without ZIP64.")
+            yield _ZIP_DATA_DESCRIPTOR.pack(b"PK\x07\x08", crc, compressed_size, size)
+            central_directory.append(
+                _ZIP_CENTRAL_HEADER.pack(
+                    b"PK\x01\x02",
+                    3 << 8 | 20,
+                    20,
+                    _ZIP_FLAGS,
+                    method,
+                    dos_time,
+                    dos_date,
+                    crc,
+                    compressed_size,
+                    size,
+                    len(name),
+                    0,
+                    0,
+                    0,
+                    0,
+                    (stat.S_IFREG | entry.mode) << 16,
+                    offset,
+                )
+                + name
+            )
+            offset += (
+                len(header) + len(name) + compressed_size + _ZIP_DATA_DESCRIPTOR.size
+            )
+
+        if len(central_directory) > 0xFFFF or offset > _ZIP_LIMIT:
+            raise RuntimeError("Archive is too large for ZIP without ZIP64.")
+        directory = b"".join(central_directory)
+        yield directory + _ZIP_END_RECORD.pack(
+            b"PK\x05\x06",
+            0,
+            0,
+            len(central_directory),
+            len(central_directory),
+            len(directory),
+            offset,
+            0,
+        )
+
+    def tar_header(self, entry: ArchiveEntry) -> bytes:
+        info = tarfile.TarInfo(entry.name)
+        info.size = typing.cast(int, entry.size)
+        info.mtime = int(typing.cast(float, entry.mtime))
+        info.mode = entry.mode
+        return info.tobuf(tarfile.PAX_FORMAT, "utf-8")
+
+    async def iter_tar(self) -> typing.AsyncIterator[bytes]:
+        for entry in self.entries:
+            yield self.tar_header(entry)
+            writer = _ArchiveEntryWriter()
+            async for chunk in self.iter_entry(entry, writer):
+                yield chunk
+            size = writer.size
+            self.check_size(entry, size)
+            if size % 512:
+                yield bytes(512 - size % 512)
+        # The end of archive marker.
+        yield bytes(1024)
+
+    def check_size(self, entry: ArchiveEntry, size: int) -> None:
+        if entry.size is not None and size != entry.size:
+            raise RuntimeError(
+                f"Archive entry {entry.name} was {size} bytes, not {entry.size}."
+            )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await anyio.to_thread.run_sync(self.stat_entries)
+        content_length = self.get_content_length()
+        if content_length is not None:
+            self.headers.setdefault("content-length", str(content_length))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        pending: typing.List[bytes] = []
+        pending_size = 0
+        if not self.send_header_only:
+            chunks = (
+                self.iter_zip() if self.archive_format == "zip" else self.iter_tar()
+            )
+            # Headers, data descriptors and small data chunks are sent together,
+            # in messages of about `chunk_size` bytes.
+            async for chunk in chunks:
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= self.chunk_size:
                     await send(
                         {
                             "type": "http.response.body",
-                            "body": chunk,
-                            "more_body": more_body,
+                            "body": b"".join(pending),
+                            "more_body": True,
                         }
                     )
+                    pending.clear()
+                    pending_size = 0
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"".join(pending),
+                "more_body": False,
+            }
+        )
         if self.background is not None:
-            await self.background()
+            await run_background(self.background, scope)
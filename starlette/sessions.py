@@ -0,0 +1,272 @@
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+if typing.TYPE_CHECKING:
+    import sqlite3
+
+SessionData = typing.Dict[str, typing.Any]
+
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{43}")
+
+
+def generate_session_id() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    return SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+
+class Session(typing.Dict[str, typing.Any]):
+    """
+    The `request.session` dictionary.
+
+    If given a `loader`, the session data is only loaded when `load()` is
+    called, which `request.session` does on first access, or when the session
+    is modified.
+    """
+
+    def __init__(
+        self,
+        data: typing.Optional[SessionData] = None,
+        loader: typing.Optional[
+            typing.Callable[[], typing.Optional[SessionData]]
+        ] = None,
+    ) -> None:
+        super().__init__(data or {})
+        self.loader = loader
+
+    @property
+    def loaded(self) -> bool:
+        return self.loader is None
+
+    def load(self) -> None:
+        if self.loader is not None:
+            loader, self.loader = self.loader, None
+            data = loader()
+            if data:
+                super().update(data)
+
+    def __setitem__(self, key: str, value: typing.Any) -> None:
+        self.load()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self.load()
+        super().__delitem__(key)
+
+    def clear(self) -> None:
+        self.load()
+        super().clear()
+
+    def pop(self, key: str, *args: typing.Any) -> typing.Any:
+        self.load()
+        return super().pop(key, *args)
+
+    def popitem(self) -> typing.Tuple[str, typing.Any]:
+        self.load()
+        return super().popitem()
+
+    def setdefault(self, key: str, default: typing.Any = None) -> typing.Any:
+        self.load()
+        return super().setdefault(key, default)
+
+    def update(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        self.load()
+        super().update(*args, **kwargs)
+
+    def __ior__(self, other: typing.Any) -> "Session":  # type: ignore[override,misc]
+        self.update(other)
+        return self
+
+
+class SessionStore:
+    """
+    Keeps session data on the server, keyed by the session ID that is sent in
+    the session cookie.
+
+    The middleware calls `blocking` stores in the threadpool, so that their I/O
+    doesn't block the event loop, loading the session as each request with a
+    session cookie arrives. Other stores are called inline, and only load the
+    session when it is first used.
+    """
+
+    blocking = True
+
+    def load(self, session_id: str) -> typing.Optional[SessionData]:
+        raise NotImplementedError()  # pragma: no cover
+
+    def save(
+        self, session_id: str, data: SessionData, max_age: typing.Optional[int]
+    ) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError()  # pragma: no cover
+
+
+def expiry(max_age: typing.Optional[int]) -> typing.Optional[float]:
+    return None if max_age is None else time.time() + max_age
+
+
+def is_expired(expires: typing.Optional[float]) -> bool:
+    return expires is not None and expires <= time.time()
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Keeps sessions in memory, in this process only. Once there are more than
+    `max_sessions`, the least recently used are dropped.
+    """
+
+    blocking = False
+
+    def __init__(self, max_sessions: int = 10000) -> None:
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, typing.Tuple[str, typing.Optional[float]]]" = (
+            OrderedDict()
+        )
+
+    def load(self, session_id: str) -> typing.Optional[SessionData]:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        serialized, expires = entry
+        if is_expired(expires):
+            del self.sessions[session_id]
+            return None
+        self.sessions.move_to_end(session_id)
+        return json.loads(serialized)  # type: ignore[no-any-return]
+
+    def save(
+        self, session_id: str, data: SessionData, max_age: typing.Optional[int]
+    ) -> None:
+        # Sessions are serialized as they would be by any other store, so they
+        # don't share mutable values with the request that saved them.
+        self.sessions[session_id] = (json.dumps(data), expiry(max_age))
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+
+class FileSessionStore(SessionStore):
+    """
+    Keeps each session in a JSON file in `directory`, named by its session ID.
+    """
+
+    def __init__(self, directory: typing.Union[str, "os.PathLike[str]"]) -> None:
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        assert is_valid_session_id(session_id), "Invalid session ID"
+        return os.path.join(self.directory, session_id + ".json")
+
+    def load(self, session_id: str) -> typing.Optional[SessionData]:
+        path = self.path(session_id)
+        try:
+            with open(path, encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if is_expired(entry["expires"]):
+            self.delete(session_id)
+            return None
+        return entry["data"]  # type: ignore[no-any-return]
+
+    def save(
+        self, session_id: str, data: SessionData, max_age: typing.Optional[int]
+    ) -> None:
+        entry = {"expires": expiry(max_age), "data": data}
+        # Write to a temporary file first, so a session is never read while
+        # half written.
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(entry, file)
+            os.replace(temporary_path, self.path(session_id))
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.unlink(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Keeps sessions in a table of an SQLite database, which is created if it
+    doesn't exist.
+    """
+
+    def __init__(
+        self,
+        database: typing.Union[str, "os.PathLike[str]"],
+        table: str = "sessions",
+    ) -> None:
+        # Imported here, so that `request.session` doesn't need the module,
+        # which takes a while to load and is missing from some Python builds.
+        import sqlite3
+
+        assert table.isidentifier(), "Invalid table name"
+        self.table = table
+        self.lock = threading.Lock()
+        self.connection: "sqlite3.Connection" = sqlite3.connect(
+            database, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL)"
+        )
+
+    def load(self, session_id: str) -> typing.Optional[SessionData]:
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT data, expires FROM {self.table} WHERE id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        serialized, expires = row
+        if is_expired(expires):
+            self.delete(session_id)
+            return None
+        return json.loads(serialized)  # type: ignore[no-any-return]
+
+    def save(
+        self, session_id: str, data: SessionData, max_age: typing.Optional[int]
+    ) -> None:
+        with self.lock:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (id, data, expires) "
+                "VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), expiry(max_age)),
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self.lock:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE id = ?", (session_id,)
+            )
+
+    def delete_expired(self) -> None:
+        with self.lock:
+            self.connection.execute(
+                f"DELETE FROM {self.table} WHERE expires <= ?", (time.time(),)
+            )
+
+    def close(self) -> None:
+        self.connection.close()
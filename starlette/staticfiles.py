@@ -1,51 +1,310 @@
+import calendar
+import hashlib
 import importlib.util
 import os
+import re
 import stat
+import struct
 import typing
-from email.utils import parsedate
+import zipfile
+import zipimport
+import zlib
+from email.utils import formatdate
+from mimetypes import guess_type
 
 import anyio
 
+from starlette._utils import parse_accept_encoding
+from starlette.background import BackgroundTask, run_background
 from starlette.datastructures import URL, Headers
 from starlette.exceptions import HTTPException
-from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.responses import (
+    FileResponse,
+    NotModifiedResponse,
+    RedirectResponse,
+    Response,
+    evaluate_preconditions,
+    precondition_response,
+)
 from starlette.types import Receive, Scope, Send
 
 PathLike = typing.Union[str, "os.PathLike[str]"]
 
+# Matches build-tool fingerprinted filenames such as `app.3f2a9c1b.js`
+# or `logo-5d41402abc4b2a76.png`. The hash must contain at least one hex
+# letter, so that date-stamped names like `report-20231019.pdf` don't match.
+# Hashes that aren't hexadecimal, such as Vite's `index-BWvH0pKa.js`, aren't
+# matched either; pass a pattern of your own for those.
+FINGERPRINT_PATTERN = re.compile(r"[.-](?=[0-9]*[a-fA-F])[0-9a-fA-F]{8,}\.[^.]+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-class NotModifiedResponse(Response):
-    NOT_MODIFIED_HEADERS = (
-        "cache-control",
-        "content-location",
-        "date",
-        "etag",
-        "expires",
-        "vary",
+
+def _stat_key(stat_result: os.stat_result) -> typing.Tuple[int, int, int, int]:
+    return (
+        stat_result.st_dev,
+        stat_result.st_ino,
+        stat_result.st_mtime_ns,
+        stat_result.st_size,
     )
 
-    def __init__(self, headers: Headers):
-        super().__init__(
-            status_code=304,
-            headers={
-                name: value
-                for name, value in headers.items()
-                if name in self.NOT_MODIFIED_HEADERS
-            },
+
+# The fixed-size part of a zip local file header, see APPNOTE.TXT 4.3.7.
+_LOCAL_FILE_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_FILE_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+class ZipDirectory:
+    """
+    A read-only directory of static files inside a zip archive.
+
+    The archive's central directory is indexed once, on instantiation.
+    """
+
+    def __init__(self, archive: PathLike, directory: str = "") -> None:
+        self.archive = os.fspath(archive)
+        prefix = directory.strip("/")
+        self.path = os.path.normpath(os.path.join(self.archive, *prefix.split("/")))
+        if prefix:
+            prefix += "/"
+        self.members: typing.Dict[str, zipfile.ZipInfo] = {}
+        self.directories: typing.Set[str] = {""}
+        with zipfile.ZipFile(self.archive) as zip_file:
+            for info in zip_file.infolist():
+                if not info.filename.startswith(prefix) or info.is_dir():
+                    continue
+                # As with `zipimport`, only stored and deflated members are
+                # supported, so they can be streamed without `zipfile`. Others
+                # are left out, as if they weren't in the archive.
+                if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    continue
+                name = info.filename[len(prefix) :]
+                self.members[name] = info
+                parts = name.split("/")
+                for index in range(1, len(parts)):
+                    self.directories.add("/".join(parts[:index]))
+        self.data_offsets: typing.Dict[str, int] = {}
+
+    def member_name(self, path: str) -> typing.Optional[str]:
+        """
+        Given a normalized path relative to this directory, return the
+        corresponding member name, or `None` if it points outside of it.
+        """
+        name = path.replace(os.sep, "/")
+        if name == ".":
+            return ""
+        if name == ".." or name.startswith("../") or name.startswith("/"):
+            return None
+        return name
+
+    def stat(self, path: str) -> typing.Optional[os.stat_result]:
+        """
+        Return a synthesized `os.stat_result` for a file or directory in the
+        archive, or `None` if it does not exist.
+        """
+        name = self.member_name(path)
+        if name is None:
+            return None
+        info = self.members.get(name)
+        if info is not None:
+            mtime = calendar.timegm(info.date_time + (0, 0, 0))
+            return os.stat_result(
+                (stat.S_IFREG | 0o444, 0, 0, 1, 0, 0, info.file_size)
+                + (mtime, mtime, mtime)
+            )
+        if name in self.directories:
+            return os.stat_result((stat.S_IFDIR | 0o555, 0, 0, 1, 0, 0, 0, 0, 0, 0))
+        return None
+
+    def data_offset(self, info: zipfile.ZipInfo) -> int:
+        """
+        Return the offset of the member's (possibly compressed) data within the
+        archive. This reads the local file header, so it should be called from
+        a worker thread.
+        """
+        offset = self.data_offsets.get(info.filename)
+        if offset is None:
+            with open(self.archive, "rb") as file:
+                file.seek(info.header_offset)
+                header = _LOCAL_FILE_HEADER.unpack(file.read(_LOCAL_FILE_HEADER.size))
+            if header[0] != _LOCAL_FILE_HEADER_SIGNATURE:
+                raise zipfile.BadZipFile(f"Bad local file header for {info.filename}")
+            filename_length, extra_length = header[-2:]
+            offset = (
+                info.header_offset
+                + _LOCAL_FILE_HEADER.size
+                + filename_length
+                + extra_length
+            )
+            self.data_offsets[info.filename] = offset
+        return offset
+
+
+class ZipFileResponse(Response):
+    """
+    Streams a member of a zip archive.
+
+    Stored members are streamed straight from the archive. Deflated members are
+    sent as-is with `Content-Encoding: gzip` when `gzip=True`, by wrapping the
+    raw deflate stream in a gzip header and trailer, and are decompressed
+    otherwise.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        directory: ZipDirectory,
+        name: str,
+        status_code: int = 200,
+        headers: typing.Optional[typing.Mapping[str, str]] = None,
+        media_type: typing.Optional[str] = None,
+        background: typing.Optional[BackgroundTask] = None,
+        method: typing.Optional[str] = None,
+        gzip: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.info = directory.members[name]
+        self.status_code = status_code
+        self.send_header_only = method is not None and method.upper() == "HEAD"
+        if media_type is None:
+            media_type = guess_type(name)[0] or "text/plain"
+        self.media_type = media_type
+        self.background = background
+        self.init_headers(headers)
+
+        self.passthrough = gzip and self.info.compress_type == zipfile.ZIP_DEFLATED
+        etag = f"{self.info.CRC:08x}-{self.info.file_size:x}"
+        if self.passthrough:
+            content_length = self.info.compress_size + 18
+            etag += "-gzip"
+            self.headers.setdefault("content-encoding", "gzip")
+            self.headers.add_vary_header("Accept-Encoding")
+        else:
+            content_length = self.info.file_size
+            if self.info.compress_type == zipfile.ZIP_DEFLATED:
+                self.headers.add_vary_header("Accept-Encoding")
+        mtime = calendar.timegm(self.info.date_time + (0, 0, 0))
+        self.headers.setdefault("content-length", str(content_length))
+        self.headers.setdefault("last-modified", formatdate(mtime, usegmt=True))
+        self.headers.setdefault("etag", f'"{etag}"')
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.status_code == 200:
+            response = precondition_response(scope, self.headers)
+            if response is not None:
+                await response(scope, receive, send)
+                if self.background is not None:
+                    await run_background(self.background, scope)
+                return
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
         )
+        if self.send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif self.passthrough or self.info.compress_type == zipfile.ZIP_STORED:
+            await self.send_raw(send)
+        else:
+            await self.send_decompressed(send)
+        if self.background is not None:
+            await run_background(self.background, scope)
+
+    async def send_raw(self, send: Send) -> None:
+        offset = await anyio.to_thread.run_sync(self.directory.data_offset, self.info)
+        if self.passthrough:
+            # A gzip member header, with no flags, mtime or extra fields.
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff",
+                    "more_body": True,
+                }
+            )
+        remaining = self.info.compress_size
+        async with await anyio.open_file(self.directory.archive, mode="rb") as file:
+            await file.seek(offset)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    raise zipfile.BadZipFile(
+                        f"Truncated member {self.info.filename} in archive"
+                    )
+                remaining -= len(chunk)
+                more_body = self.passthrough or remaining > 0
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": more_body,
+                    }
+                )
+        if self.passthrough:
+            trailer = struct.pack(
+                "<2L", self.info.CRC, self.info.file_size & 0xFFFFFFFF
+            )
+            await send({"type": "http.response.body", "body": trailer})
+        elif self.info.compress_size == 0:
+            await send({"type": "http.response.body", "body": b""})
+
+    async def send_decompressed(self, send: Send) -> None:
+        offset = await anyio.to_thread.run_sync(self.directory.data_offset, self.info)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        crc = 0
+        remaining = self.info.compress_size
+        file = await anyio.to_thread.run_sync(open, self.directory.archive, "rb")
+        try:
+            await anyio.to_thread.run_sync(file.seek, offset)
+            while remaining > 0:
+                size = min(self.chunk_size, remaining)
+                chunk = await anyio.to_thread.run_sync(
+                    self.inflate_chunk, file, decompressor, size
+                )
+                remaining -= size
+                crc = zlib.crc32(chunk, crc)
+                if chunk:
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": True}
+                    )
+        finally:
+            await anyio.to_thread.run_sync(file.close)
+        chunk = decompressor.flush()
+        if zlib.crc32(chunk, crc) != self.info.CRC:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for {self.info.filename} in archive")
+        await send({"type": "http.response.body", "body": chunk})
+
+    def inflate_chunk(
+        self,
+        file: typing.BinaryIO,
+        decompressor: "zlib._Decompress",
+        size: int,
+    ) -> bytes:
+        """
+        Read and decompress the next chunk of the member, in a worker thread.
+        """
+        chunk = file.read(size)
+        if len(chunk) != size:
+            raise zipfile.BadZipFile(
+                f"Truncated member {self.info.filename} in archive"
+            )
+        return decompressor.decompress(chunk)
 
 
 class StaticFiles:
     def __init__(
         self,
         *,
-        directory: typing.Optional[PathLike] = None,
+        directory: typing.Optional[typing.Union[PathLike, ZipDirectory]] = None,
         packages: typing.Optional[
             typing.List[typing.Union[str, typing.Tuple[str, str]]]
         ] = None,
         html: bool = False,
         check_dir: bool = True,
         follow_symlink: bool = False,
+        content_etag: bool = False,
+        immutable_pattern: typing.Optional[typing.Union[str, "re.Pattern[str]"]] = None,
     ) -> None:
         self.directory = directory
         self.packages = packages
@@ -53,21 +312,37 @@ class StaticFiles:
         self.html = html
         self.config_checked = False
         self.follow_symlink = follow_symlink
-        if check_dir and directory is not None and not os.path.isdir(directory):
+        self.content_etag = content_etag
+        self.immutable_pattern = (
+            re.compile(immutable_pattern)
+            if isinstance(immutable_pattern, str)
+            else immutable_pattern
+        )
+        self.content_etags: typing.Dict[
+            str, typing.Tuple[typing.Tuple[int, int, int, int], str]
+        ] = {}
+        if (
+            check_dir
+            and directory is not None
+            and not isinstance(directory, ZipDirectory)
+            and not os.path.isdir(directory)
+        ):
             raise RuntimeError(f"Directory '{directory}' does not exist")
 
     def get_directories(
         self,
-        directory: typing.Optional[PathLike] = None,
+        directory: typing.Optional[typing.Union[PathLike, ZipDirectory]] = None,
         packages: typing.Optional[
             typing.List[typing.Union[str, typing.Tuple[str, str]]]
         ] = None,
-    ) -> typing.List[PathLike]:
+    ) -> typing.List[typing.Union[PathLike, ZipDirectory]]:
         """
         Given `directory` and `packages` arguments, return a list of all the
         directories that should be used for serving static files from.
+
+        Packages imported from a zip archive are served from that archive.
         """
-        directories = []
+        directories: typing.List[typing.Union[PathLike, ZipDirectory]] = []
         if directory is not None:
             directories.append(directory)
 
@@ -82,6 +357,18 @@ class StaticFiles:
             package_directory = os.path.normpath(
                 os.path.join(spec.origin, "..", statics_dir)
             )
+            if isinstance(spec.loader, zipimport.zipimporter):
+                archive = spec.loader.archive
+                zip_directory = ZipDirectory(
+                    archive,
+                    os.path.relpath(package_directory, archive).replace(os.sep, "/"),
+                )
+                assert len(zip_directory.directories) > 1 or zip_directory.members, (
+                    f"Directory '{statics_dir!r}' in package {package!r} "
+                    "could not be found."
+                )
+                directories.append(zip_directory)
+                continue
             assert os.path.isdir(
                 package_directory
             ), f"Directory '{statics_dir!r}' in package {package!r} could not be found."
@@ -151,6 +438,11 @@ class StaticFiles:
                 self.lookup_path, "404.html"
             )
             if stat_result and stat.S_ISREG(stat_result.st_mode):
+                zip_member = self.lookup_zip_member(full_path)
+                if zip_member is not None:
+                    return ZipFileResponse(
+                        *zip_member, method=scope["method"], status_code=404
+                    )
                 return FileResponse(
                     full_path,
                     stat_result=stat_result,
@@ -163,6 +455,11 @@ class StaticFiles:
         self, path: str
     ) -> typing.Tuple[str, typing.Optional[os.stat_result]]:
         for directory in self.all_directories:
+            if isinstance(directory, ZipDirectory):
+                stat_result = directory.stat(path)
+                if stat_result is None:
+                    continue
+                return os.path.normpath(os.path.join(directory.path, path)), stat_result
             joined_path = os.path.join(directory, path)
             if self.follow_symlink:
                 full_path = os.path.abspath(joined_path)
@@ -174,11 +471,62 @@ class StaticFiles:
                 # directory.
                 continue
             try:
-                return full_path, os.stat(full_path)
+                stat_result = os.stat(full_path)
             except (FileNotFoundError, NotADirectoryError):
                 continue
+            if self.content_etag and stat.S_ISREG(stat_result.st_mode):
+                # We're already running in a worker thread here, so this is
+                # the cheapest place to hash the file contents on a cache miss.
+                self.get_content_etag(full_path, stat_result)
+            return full_path, stat_result
         return "", None
 
+    def get_content_etag(self, full_path: str, stat_result: os.stat_result) -> str:
+        """
+        Return an ETag derived from the file contents, so that it remains stable
+        across deploys that only touch the file's modification time.
+
+        The digest is cached per path, and only recomputed when the file's
+        device, inode, modification time or size change. This reads the whole
+        file on a cache miss, so it should be called from a worker thread.
+        """
+        cached = self.cached_content_etag(full_path, stat_result)
+        if cached is not None:
+            return cached
+
+        digest = hashlib.sha256()
+        with open(full_path, "rb") as file:
+            for chunk in iter(lambda: file.read(64 * 1024), b""):
+                digest.update(chunk)
+        etag = '"' + digest.hexdigest()[:32] + '"'
+        self.content_etags[full_path] = (_stat_key(stat_result), etag)
+        return etag
+
+    def lookup_zip_member(
+        self, full_path: PathLike
+    ) -> typing.Optional[typing.Tuple[ZipDirectory, str]]:
+        """
+        Given a full path returned by `lookup_path`, return the zip directory
+        and member name it refers to, or `None` for regular files.
+        """
+        full_path = os.fspath(full_path)
+        for directory in self.all_directories:
+            if isinstance(directory, ZipDirectory) and (
+                full_path.startswith(directory.path + os.sep)
+            ):
+                name = directory.member_name(os.path.relpath(full_path, directory.path))
+                if name is not None and name in directory.members:
+                    return directory, name
+        return None
+
+    def cached_content_etag(
+        self, full_path: PathLike, stat_result: os.stat_result
+    ) -> typing.Optional[str]:
+        cached = self.content_etags.get(str(full_path))
+        if cached is not None and cached[0] == _stat_key(stat_result):
+            return cached[1]
+        return None
+
     def file_response(
         self,
         full_path: PathLike,
@@ -189,9 +537,37 @@ class StaticFiles:
         method = scope["method"]
         request_headers = Headers(scope=scope)
 
-        response = FileResponse(
-            full_path, status_code=status_code, stat_result=stat_result, method=method
-        )
+        headers: typing.Dict[str, str] = {}
+        if self.content_etag:
+            etag = self.cached_content_etag(full_path, stat_result)
+            if etag is not None:
+                headers["etag"] = etag
+        if self.immutable_pattern is not None and self.immutable_pattern.search(
+            os.path.basename(full_path)
+        ):
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+
+        response: Response
+        zip_member = self.lookup_zip_member(full_path)
+        if zip_member is not None:
+            qualities = parse_accept_encoding(
+                request_headers.get("accept-encoding", "")
+            )
+            response = ZipFileResponse(
+                *zip_member,
+                status_code=status_code,
+                headers=headers,
+                method=method,
+                gzip=qualities.get("gzip", qualities.get("*", 0.0)) > 0,
+            )
+        else:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                headers=headers,
+                stat_result=stat_result,
+                method=method,
+            )
         if self.is_not_modified(response.headers, request_headers):
             return NotModifiedResponse(response.headers)
         return response
@@ -202,7 +578,7 @@ class StaticFiles:
         pointed at a directory, so that we can raise loud errors rather than
         just returning 404 responses.
         """
-        if self.directory is None:
+        if self.directory is None or isinstance(self.directory, ZipDirectory):
             return
 
         try:
@@ -223,24 +599,4 @@ class StaticFiles:
         Given the request and response headers, return `True` if an HTTP
         "Not Modified" response could be returned instead.
         """
-        try:
-            if_none_match = request_headers["if-none-match"]
-            etag = response_headers["etag"]
-            if if_none_match == etag:
-                return True
-        except KeyError:
-            pass
-
-        try:
-            if_modified_since = parsedate(request_headers["if-modified-since"])
-            last_modified = parsedate(response_headers["last-modified"])
-            if (
-                if_modified_since is not None
-                and last_modified is not None
-                and if_modified_since >= last_modified
-            ):
-                return True
-        except KeyError:
-            pass
-
-        return False
+        return evaluate_preconditions(request_headers, response_headers) == 304
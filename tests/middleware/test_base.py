@@ -897,3 +897,40 @@ def test_pr_1519_comment_1236166180_example() -> None:
     resp.raise_for_status()
 
     assert bodies == [b"Hello, World!-foo"]
+
+
+@pytest.mark.anyio
+async def test_early_hints_are_sent_straight_through() -> None:
+    messages: List[Message] = []
+
+    async def receive() -> Message:  # pragma: no cover
+        await anyio.sleep_forever()
+        raise AssertionError()
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    async def endpoint(scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope, receive, send)
+        await request.send_early_hints(["</app.css>; rel=preload; as=style"])
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    class PassingMiddleware(BaseHTTPMiddleware):
+        async def dispatch(
+            self, request: Request, call_next: RequestResponseEndpoint
+        ) -> Response:
+            return await call_next(request)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [],
+        "extensions": {"http.response.early_hint": {}},
+    }
+    await PassingMiddleware(endpoint)(scope, receive, send)
+    assert [message["type"] for message in messages] == [
+        "http.response.early_hint",
+        "http.response.start",
+        "http.response.body",
+        "http.response.body",
+    ]
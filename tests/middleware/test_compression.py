@@ -0,0 +1,386 @@
+import gzip
+import zlib
+
+import anyio
+import pytest
+
+from starlette._utils import select_encoder
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.compression import (
+    CompressionCache,
+    CompressionMiddleware,
+    CompressionResponder,
+    DeflateEncoder,
+    Encoder,
+    GZipEncoder,
+    default_encoders,
+)
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+def homepage(request):
+    return PlainTextResponse("x" * 4000)
+
+
+def streaming(request):
+    async def generator():
+        for index in range(10):
+            yield b"x" * 400
+
+    return StreamingResponse(generator())
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate", "gzip"),
+        ("deflate, gzip", "gzip"),
+        ("gzip;q=0.5, deflate", "deflate"),
+        ("gzip; q=0.5, deflate; q=0.8", "deflate"),
+        ("gzip;q=0, deflate;q=0", None),
+        ("GZIP", "gzip"),
+        ("*", "gzip"),
+        ("*;q=0.5, deflate", "deflate"),
+        ("*, gzip;q=0", "deflate"),
+        ("gzip;q=invalid, deflate;q=0.1", "deflate"),
+        ("identity", None),
+        ("x-gzip", None),
+        ("", None),
+    ],
+)
+def test_select_encoder(accept_encoding, expected):
+    encoder = select_encoder(accept_encoding, [GZipEncoder(), DeflateEncoder()])
+    assert (encoder and encoder.name) == expected
+
+
+def test_default_encoders():
+    names = [encoder.name for encoder in default_encoders()]
+    assert names[-2:] == ["gzip", "deflate"]
+
+
+@pytest.mark.parametrize("path", ["/", "/streaming"])
+def test_compression_negotiates_encoding(test_client_factory, path):
+    app = Starlette(
+        routes=[Route("/", homepage), Route("/streaming", streaming)],
+        middleware=[Middleware(CompressionMiddleware)],
+    )
+    client = test_client_factory(app)
+
+    response = client.get(path, headers={"accept-encoding": "gzip;q=0.5, deflate"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "deflate"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.text == "x" * 4000
+
+    response = client.get(path, headers={"accept-encoding": "gzip, deflate;q=0.5"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.text == "x" * 4000
+
+    response = client.get(path, headers={"accept-encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "x" * 4000
+
+
+@pytest.mark.anyio
+async def test_compression_encoder_options():
+    bodies = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip, deflate")],
+    }
+    encoders = [GZipEncoder(level=1, minimum_size=5000), DeflateEncoder(level=9)]
+    app = CompressionMiddleware(PlainTextResponse("abc" * 1000), encoders)
+    await app(scope, receive, send)
+    assert bodies == [("abc" * 1000).encode()]
+
+    bodies.clear()
+    app = CompressionMiddleware(PlainTextResponse("abc" * 2000), encoders)
+    await app(scope, receive, send)
+    assert gzip.decompress(bodies[0]) == ("abc" * 2000).encode()
+    # The XFL byte of the gzip header marks the fastest compression level.
+    assert bodies[0][8] == 4
+
+    bodies.clear()
+    scope["headers"] = [(b"accept-encoding", b"deflate")]
+    app = CompressionMiddleware(PlainTextResponse("abc" * 2000), encoders)
+    await app(scope, receive, send)
+    assert zlib.decompress(bodies[0]) == ("abc" * 2000).encode()
+    # The FLEVEL bits of the zlib header mark the slowest compression level.
+    assert bodies[0][1] >> 6 == 3
+
+
+def test_compression_custom_encoder(test_client_factory):
+    class ReverseEncoder(Encoder):
+        name = "x-reverse"
+        default_level = 0
+
+        def compressor(self):
+            chunks = []
+
+            def compress(data, more_body):
+                chunks.append(data)
+                return b"" if more_body else b"".join(chunks)[::-1]
+
+            return compress
+
+    app = Starlette(
+        routes=[Route("/", homepage)],
+        middleware=[
+            Middleware(CompressionMiddleware, encoders=[ReverseEncoder(minimum_size=0)])
+        ],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip, x-reverse"})
+    assert response.headers["Content-Encoding"] == "x-reverse"
+    assert response.content == b"x" * 4000
+
+
+@pytest.mark.parametrize("module, name", [("brotli", "br"), ("zstandard", "zstd")])
+def test_compression_optional_encoders(test_client_factory, module, name):
+    pytest.importorskip(module)
+    app = Starlette(
+        routes=[Route("/", homepage)],
+        middleware=[Middleware(CompressionMiddleware)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": f"gzip;q=0.5, {name}"})
+    assert response.headers["Content-Encoding"] == name
+
+
+def test_gzip_honours_quality_values(test_client_factory):
+    app = Starlette(
+        routes=[Route("/", homepage)],
+        middleware=[Middleware(GZipMiddleware)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip;q=0, deflate"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "x" * 4000
+
+
+@pytest.mark.parametrize(
+    "media_type, headers, options, compressed",
+    [
+        ("text/html", {}, {}, True),
+        ("application/json", {}, {}, True),
+        ("application/ld+json", {}, {}, True),
+        ("image/svg+xml", {}, {}, True),
+        ("image/png", {}, {}, False),
+        ("application/zip", {}, {}, False),
+        ("video/mp4", {}, {}, False),
+        ("image/png", {}, {"compressible_types": None}, True),
+        ("image/png", {}, {"compressible_types": ["image/*"]}, True),
+        ("text/csv", {}, {"excluded_types": ["text/csv"]}, False),
+        ("text/html", {"Cache-Control": "public, no-transform"}, {}, False),
+        ("text/html", {"Cache-Control": "no-cache"}, {}, True),
+    ],
+)
+def test_compression_media_types(
+    test_client_factory, media_type, headers, options, compressed
+):
+    def endpoint(request):
+        return Response(b"x" * 4000, media_type=media_type, headers=headers)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(CompressionMiddleware, **options)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.content == b"x" * 4000
+    assert ("Content-Encoding" in response.headers) == compressed
+    assert "Content-Length" in response.headers
+
+
+@pytest.mark.anyio
+async def test_compression_passes_through_without_compressor():
+    messages = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"image/png")],
+            }
+        )
+        # The headers are sent before the body, without waiting for it.
+        assert len(messages) == 1
+        await send({"type": "http.response.body", "body": b"png" * 1000})
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    responder = CompressionResponder(app, GZipEncoder())
+    await responder(scope, receive, send)
+    assert messages[1]["body"] == b"png" * 1000
+    assert responder.compressor is None
+
+
+def test_gzip_skips_incompressible_media_types(test_client_factory):
+    def endpoint(request):
+        return Response(b"x" * 4000, media_type="image/jpeg")
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(GZipMiddleware)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "size, threadpool_minimum_size, hops",
+    [(4000, 128 * 1024, 0), (200 * 1024, 128 * 1024, 1), (4000, 1000, 1)],
+)
+def test_compression_offloads_large_chunks(
+    test_client_factory, monkeypatch, size, threadpool_minimum_size, hops
+):
+    run_sync = anyio.to_thread.run_sync
+    calls = []
+
+    async def counting_run_sync(func, *args, **kwargs):
+        calls.append(func)
+        return await run_sync(func, *args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", counting_run_sync)
+
+    async def endpoint(request):
+        return PlainTextResponse("x" * size)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[
+            Middleware(GZipMiddleware, threadpool_minimum_size=threadpool_minimum_size)
+        ],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.text == "x" * size
+    assert len(calls) == hops
+
+
+def test_compression_cache(test_client_factory):
+    compressed = []
+
+    class CountingGZipEncoder(GZipEncoder):
+        def compressor(self):
+            compress = super().compressor()
+
+            def counting_compress(data, more_body):
+                compressed.append(data)
+                return compress(data, more_body)
+
+            return counting_compress
+
+    cache = CompressionCache(max_body_size=10000)
+    app = Starlette(
+        routes=[
+            Route("/", homepage),
+            Route("/large", lambda request: PlainTextResponse("y" * 20000)),
+            Route("/streaming", streaming),
+        ],
+        middleware=[
+            Middleware(
+                CompressionMiddleware,
+                encoders=[CountingGZipEncoder(), DeflateEncoder()],
+                cache=cache,
+            )
+        ],
+    )
+    client = test_client_factory(app)
+
+    for _ in range(3):
+        response = client.get("/", headers={"accept-encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.text == "x" * 4000
+    assert len(compressed) == 1
+    assert len(cache.entries) == 1
+
+    # Each encoding is cached separately.
+    response = client.get("/", headers={"accept-encoding": "deflate"})
+    assert response.headers["Content-Encoding"] == "deflate"
+    assert response.text == "x" * 4000
+    assert len(cache.entries) == 2
+
+    # Bodies over `max_body_size`, and streaming responses, aren't cached.
+    for path in ("/large", "/streaming", "/large", "/streaming"):
+        client.get(path, headers={"accept-encoding": "gzip"})
+    assert len(cache.entries) == 2
+    # Ten chunks, and the empty final one, per streaming response.
+    assert len(compressed) == 1 + 2 + 2 * 11
+
+
+def test_compression_cache_eviction():
+    cache = CompressionCache(max_size=10)
+    encoder = GZipEncoder()
+    first, second = cache.key(b"first", encoder), cache.key(b"second", encoder)
+    assert first == cache.key(b"first", GZipEncoder())
+    assert first != cache.key(b"first", GZipEncoder(level=9))
+    assert first != cache.key(b"first", DeflateEncoder())
+
+    cache.set(first, b"12345")
+    cache.set(second, b"123456")
+    assert cache.get(first) is None
+    assert cache.get(second) == b"123456"
+    assert cache.size == 6
+
+    cache.set(first, b"x" * 11)
+    assert cache.get(first) is None
+    cache.clear()
+    assert cache.size == 0
+    assert cache.entries == {}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("middleware", [GZipMiddleware, CompressionMiddleware])
+async def test_compression_forwards_early_hints(middleware):
+    messages = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    async def endpoint(scope, receive, send):
+        request = Request(scope, receive, send)
+        await request.send_early_hints(["</app.css>; rel=preload; as=style"])
+        await PlainTextResponse("x" * 4000)(scope, receive, send)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "extensions": {"http.response.early_hint": {}},
+    }
+    await middleware(endpoint)(scope, receive, send)
+    assert messages[0] == {
+        "type": "http.response.early_hint",
+        "links": [b"</app.css>; rel=preload; as=style"],
+    }
+    assert messages[1]["type"] == "http.response.start"
+    assert (b"content-encoding", b"gzip") in messages[1]["headers"]
@@ -521,3 +521,105 @@ def test_cors_allowed_origin_does_not_leak_between_credentialed_requests(
     response = client.get("/", headers={"Origin": "https://someplace.org"})
     assert response.headers["access-control-allow-origin"] == "*"
     assert "access-control-allow-credentials" not in response.headers
+
+
+def test_cors_caches_origin_decisions(test_client_factory, monkeypatch):
+    def homepage(request):
+        return PlainTextResponse("Homepage", status_code=200)
+
+    app = Starlette(
+        routes=[Route("/", endpoint=homepage)],
+        middleware=[
+            Middleware(
+                CORSMiddleware,
+                allow_origins=["https://example.org"],
+                allow_origin_regex=r"https://.*\.example\.org",
+                allow_headers=["X-Example"],
+            )
+        ],
+    )
+    monkeypatch.setattr(CORSMiddleware, "cache_size", 2)
+    client = test_client_factory(app)
+
+    built = []
+    build_origin_policy = CORSMiddleware.build_origin_policy
+
+    def counting_build_origin_policy(self, origin):
+        built.append(origin)
+        return build_origin_policy(self, origin)
+
+    monkeypatch.setattr(
+        CORSMiddleware, "build_origin_policy", counting_build_origin_policy
+    )
+
+    for origin, allowed in [
+        ("https://example.org", True),
+        ("https://api.example.org", True),
+        ("https://example.org", True),
+        ("https://api.example.org", True),
+        ("https://other.org", False),
+        ("https://example.org", True),
+    ]:
+        response = client.get("/", headers={"Origin": origin})
+        assert ("access-control-allow-origin" in response.headers) is allowed
+        if allowed:
+            assert response.headers["access-control-allow-origin"] == origin
+            assert response.headers["vary"] == "Origin"
+
+    # Regex matches are cached too. The least recently used origin is evicted
+    # once the cache is full.
+    assert built == [
+        "https://example.org",
+        "https://api.example.org",
+        "https://other.org",
+        "https://example.org",
+    ]
+
+    headers = {
+        "Origin": "https://api.example.org",
+        "Access-Control-Request-Method": "GET",
+        "Access-Control-Request-Headers": "X-Example, Accept",
+    }
+    for _ in range(2):
+        response = client.options("/", headers=headers)
+        assert response.status_code == 200
+        assert response.text == "OK"
+        assert response.headers["content-length"] == "2"
+        assert (
+            response.headers["access-control-allow-origin"] == "https://api.example.org"
+        )
+
+    headers["Access-Control-Request-Headers"] = "X-Example, X-Other"
+    for _ in range(2):
+        response = client.options("/", headers=headers)
+        assert response.status_code == 400
+        assert response.text == "Disallowed CORS headers"
+
+
+def test_cors_simple_headers_replace_existing_headers(test_client_factory):
+    def homepage(request):
+        return PlainTextResponse(
+            "Homepage",
+            headers={
+                "Access-Control-Allow-Origin": "https://wrong.org",
+                "Access-Control-Expose-Headers": "X-Wrong",
+            },
+        )
+
+    app = Starlette(
+        routes=[Route("/", endpoint=homepage)],
+        middleware=[
+            Middleware(
+                CORSMiddleware,
+                allow_origins=["https://example.org"],
+                expose_headers=["X-Status"],
+            )
+        ],
+    )
+    client = test_client_factory(app)
+    response = client.get("/", headers={"Origin": "https://example.org"})
+    assert response.headers["access-control-allow-origin"] == "https://example.org"
+    assert response.headers["access-control-expose-headers"] == "X-Status"
+    assert response.headers.get_list("access-control-allow-origin") == [
+        "https://example.org"
+    ]
@@ -0,0 +1,434 @@
+import contextvars
+import os
+import typing
+
+import anyio
+import pytest
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.dispatch import DispatchMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+
+
+class CustomMiddleware(DispatchMiddleware):
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["Custom-Header"] = "Example"
+        response.headers["Downstream-Status"] = str(response.status_code)
+        return response
+
+
+def homepage(request):
+    return PlainTextResponse("Homepage")
+
+
+def exc(request):
+    raise Exception("Exc")
+
+
+def exc_stream(request):
+    def faulty_stream():
+        yield b"Ok"
+        raise Exception("Faulty Stream")
+
+    return StreamingResponse(faulty_stream())
+
+
+class NoResponse:
+    def __init__(self, scope, receive, send):
+        pass
+
+    def __await__(self):
+        return self.dispatch().__await__()
+
+    async def dispatch(self):
+        pass
+
+
+async def websocket_endpoint(session):
+    await session.accept()
+    await session.send_text("Hello, world!")
+    await session.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/", endpoint=homepage),
+        Route("/exc", endpoint=exc),
+        Route("/exc-stream", endpoint=exc_stream),
+        Route("/no-response", endpoint=NoResponse),
+        WebSocketRoute("/ws", endpoint=websocket_endpoint),
+    ],
+    middleware=[Middleware(CustomMiddleware)],
+)
+
+
+def test_dispatch_middleware(test_client_factory):
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.text == "Homepage"
+    assert response.headers["Custom-Header"] == "Example"
+    assert response.headers["Downstream-Status"] == "200"
+
+    response = client.get("/missing")
+    assert response.status_code == 404
+    assert response.headers["Downstream-Status"] == "404"
+
+    # Errors aren't wrapped in exception groups, since there's no task group.
+    with pytest.raises(Exception, match="^Exc$"):
+        client.get("/exc")
+
+    # `StreamingResponse` runs its own task group, so may wrap the error.
+    with pytest.raises(Exception):
+        client.get("/exc-stream")
+
+    with pytest.raises(RuntimeError, match="No response returned."):
+        client.get("/no-response")
+
+    with client.websocket_connect("/ws") as session:
+        assert session.receive_text() == "Hello, world!"
+
+
+def test_dispatch_middleware_function(test_client_factory):
+    async def add_header(request, call_next):
+        response = await call_next(request)
+        response.set_cookie("visited", "yes")
+        return response
+
+    app = Starlette(
+        routes=[Route("/", homepage)],
+        middleware=[Middleware(DispatchMiddleware, dispatch=add_header)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.text == "Homepage"
+    assert response.cookies["visited"] == "yes"
+
+
+def test_dispatch_middleware_can_replace_response(test_client_factory):
+    class ReplacingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            body = response.body.decode().upper()
+            return PlainTextResponse(body, status_code=201)
+
+    app = Starlette(
+        routes=[Route("/", homepage)],
+        middleware=[Middleware(ReplacingMiddleware)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.status_code == 201
+    assert response.text == "HOMEPAGE"
+
+
+def test_dispatch_middleware_replays_request_body(test_client_factory):
+    class ReadingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            assert await request.body() == b"payload"
+            return await call_next(request)
+
+    class StreamingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            assert b"".join([chunk async for chunk in request.stream()])
+            return await call_next(request)
+
+    async def echo(request):
+        return PlainTextResponse(await request.body())
+
+    for middleware in (ReadingMiddleware, StreamingMiddleware):
+        app = Starlette(
+            routes=[Route("/", echo, methods=["POST"])],
+            middleware=[Middleware(middleware)],
+        )
+        client = test_client_factory(app)
+        response = client.post("/", content=b"payload")
+        expected = b"payload" if middleware is ReadingMiddleware else b""
+        assert response.content == expected
+
+
+@pytest.mark.anyio
+async def test_dispatch_middleware_streams_without_waiting():
+    chunks = []
+    more = anyio.Event()
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            chunks.append(message["status"])
+        elif message["type"] == "http.response.body":
+            chunks.append(message["body"])
+            more.set()
+
+    async def generator():
+        yield b"first"
+        # The first chunk has reached the client before the next is produced.
+        await more.wait()
+        yield b"second"
+
+    class PassingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            return await call_next(request)
+
+    downstream = StreamingResponse(generator())
+    middleware = PassingMiddleware(downstream)
+    scope = {"type": "http", "method": "GET", "headers": []}
+    with anyio.fail_after(1):
+        await middleware(scope, receive, send)
+    # Streaming responses are sent before `dispatch()` sees them.
+    assert chunks == [200, b"first", b"second", b""]
+
+
+def test_dispatch_middleware_rejects_changes_to_sent_responses(
+    test_client_factory,
+):
+    class ReplacingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            await call_next(request)
+            return PlainTextResponse("replaced")
+
+    async def endpoint(request):
+        return StreamingResponse(iter([b"streamed"]))
+
+    for middleware in (CustomMiddleware, ReplacingMiddleware):
+        app = Starlette(
+            routes=[Route("/", endpoint)],
+            middleware=[Middleware(middleware)],
+        )
+        client = test_client_factory(app)
+        with pytest.raises(RuntimeError, match="has already been sent"):
+            client.get("/")
+
+
+def test_dispatch_middleware_buffers_responses_with_content_length(
+    test_client_factory, tmpdir
+):
+    path = os.path.join(tmpdir, "example.txt")
+    with open(path, "wb") as file:
+        file.write(b"x" * 200000)
+
+    async def endpoint(request):
+        return FileResponse(path)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(CustomMiddleware)],
+    )
+    client = test_client_factory(app)
+    response = client.get("/")
+    # A file sent in several chunks is held back, so its headers can change.
+    assert response.headers["Custom-Header"] == "Example"
+    assert response.content == b"x" * 200000
+
+
+def test_dispatch_middleware_copies_reused_buffers(test_client_factory, tmpdir):
+    path = os.path.join(tmpdir, "example.bin")
+    content = os.urandom(10000)
+    with open(path, "wb") as file:
+        file.write(content)
+
+    class ReusingFileResponse(FileResponse):
+        chunk_size = 1024
+        reuse_buffer = True
+
+    class PassingMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            return await call_next(request)
+
+    async def endpoint(request):
+        return ReusingFileResponse(path)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(PassingMiddleware)],
+    )
+    client = test_client_factory(app)
+    assert client.get("/").content == content
+
+
+@pytest.mark.anyio
+async def test_dispatch_middleware_forwards_early_hints():
+    messages = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    async def downstream(scope, receive, send):
+        await send({"type": "http.response.early_hint", "links": [b"</a.css>"]})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"body"})
+
+    class EarlyHintMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            # The early hint was sent straight away, before the response.
+            assert [message["type"] for message in messages] == [
+                "http.response.early_hint"
+            ]
+            assert response.body == b"body"
+            return response
+
+    middleware = EarlyHintMiddleware(downstream)
+    await middleware({"type": "http", "method": "GET"}, receive, send)
+    assert messages[1:] == [
+        {"type": "http.response.start", "status": 200, "headers": []},
+        {"type": "http.response.body", "body": b"body"},
+    ]
+
+
+@pytest.mark.anyio
+async def test_dispatch_middleware_replays_debug_info_and_trailers():
+    messages = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    async def downstream(scope, receive, send):
+        await send({"type": "http.response.debug", "info": {"template": "x"}})
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [],
+                "trailers": True,
+            }
+        )
+        await send({"type": "http.response.body", "body": b"body"})
+        await send({"type": "http.response.trailers", "headers": [(b"a", b"b")]})
+
+    middleware = CustomMiddleware(downstream)
+    await middleware({"type": "http", "method": "GET"}, receive, send)
+    assert [message["type"] for message in messages] == [
+        "http.response.debug",
+        "http.response.start",
+        "http.response.body",
+        "http.response.trailers",
+    ]
+    assert messages[1]["trailers"] is True
+    assert (b"custom-header", b"Example") in messages[1]["headers"]
+
+
+def test_dispatch_middleware_runs_background_tasks(test_client_factory):
+    ran: typing.List[str] = []
+
+    class BackgroundMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            response.background = BackgroundTask(ran.append, "middleware")
+            return response
+
+    async def endpoint(request):
+        return PlainTextResponse("ok", background=BackgroundTask(ran.append, "app"))
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(BackgroundMiddleware)],
+    )
+    client = test_client_factory(app)
+    assert client.get("/").text == "ok"
+    assert ran == ["app", "middleware"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("replace", [False, True])
+async def test_dispatch_middleware_sends_response_before_background(replace):
+    sent: typing.List[bytes] = []
+    seen = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent.append(message["body"])
+
+    def background():
+        seen.append(list(sent))
+
+    class OuterMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            if replace:
+                return PlainTextResponse("replaced")
+            return response
+
+    downstream = PlainTextResponse("ok", background=BackgroundTask(background))
+    # Nested layers hand background tasks outwards, to the outermost one.
+    middleware = OuterMiddleware(CustomMiddleware(downstream))
+    scope = {"type": "http", "method": "GET", "headers": []}
+    await middleware(scope, receive, send)
+    assert seen == [[b"replaced" if replace else b"ok"]]
+    assert "starlette.deferred_background" not in scope
+
+
+def test_dispatch_middleware_uses_no_task_groups(test_client_factory, monkeypatch):
+    created = []
+    create_task_group = anyio.create_task_group
+
+    def counting_create_task_group():
+        created.append(True)
+        return create_task_group()
+
+    monkeypatch.setattr(anyio, "create_task_group", counting_create_task_group)
+
+    async def endpoint(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(CustomMiddleware)] * 5,
+    )
+    client = test_client_factory(app)
+    assert client.get("/").text == "ok"
+    assert created == []
+
+
+ctxvar: contextvars.ContextVar[str] = contextvars.ContextVar("ctxvar")
+
+
+def test_dispatch_middleware_shares_context(test_client_factory):
+    class ContextMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            response = await call_next(request)
+            response.headers["ctxvar"] = ctxvar.get()
+            return response
+
+    async def endpoint(request):
+        ctxvar.set("set by endpoint")
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(ContextMiddleware)],
+    )
+    client = test_client_factory(app)
+    assert client.get("/").headers["ctxvar"] == "set by endpoint"
+
+
+def test_dispatch_middleware_request_is_shared(test_client_factory):
+    class StateMiddleware(DispatchMiddleware):
+        async def dispatch(self, request, call_next):
+            request.state.user = "alice"
+            return await call_next(request)
+
+    async def endpoint(request: Request):
+        return PlainTextResponse(request.state.user)
+
+    app = Starlette(
+        routes=[Route("/", endpoint)],
+        middleware=[Middleware(StateMiddleware)],
+    )
+    client = test_client_factory(app)
+    assert client.get("/").text == "alice"
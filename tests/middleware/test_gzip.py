@@ -1,3 +1,9 @@
+import gzip
+import zlib
+
+import anyio
+import pytest
+
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.gzip import GZipMiddleware
@@ -78,6 +84,33 @@ def test_gzip_streaming_response(test_client_factory):
     assert "Content-Length" not in response.headers
 
 
+def test_gzip_buffer_responses(test_client_factory):
+    def homepage(request):
+        return PlainTextResponse(bytearray(b"x" * 4000))
+
+    def streaming(request):
+        async def generator():
+            buffer = memoryview(b"y" * 4000)
+            for index in range(10):
+                yield buffer[index * 400 : (index + 1) * 400]
+
+        return StreamingResponse(generator())
+
+    app = Starlette(
+        routes=[Route("/", endpoint=homepage), Route("/streaming", streaming)],
+        middleware=[Middleware(GZipMiddleware)],
+    )
+
+    client = test_client_factory(app)
+    response = client.get("/", headers={"accept-encoding": "gzip"})
+    assert response.text == "x" * 4000
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    response = client.get("/streaming", headers={"accept-encoding": "gzip"})
+    assert response.text == "y" * 4000
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
 def test_gzip_ignored_for_responses_with_encoding_set(test_client_factory):
     def homepage(request):
         async def generator(bytes, count):
@@ -100,3 +133,74 @@ def test_gzip_ignored_for_responses_with_encoding_set(test_client_factory):
     assert response.text == "x" * 4000
     assert response.headers["Content-Encoding"] == "text"
     assert "Content-Length" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_gzip_flushes_event_streams():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def generator():
+        for index in range(3):
+            yield f"chunk {index} ".encode() * 200
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    app = GZipMiddleware(StreamingResponse(generator(), media_type="text/plain"))
+    await app(scope, receive, send)
+
+    # Other streams are buffered by the compressor, rather than flushed, so
+    # only the gzip header is sent before the end.
+    assert len(bodies) == 2
+    assert gzip.decompress(b"".join(bodies)) == b"".join(
+        f"chunk {index} ".encode() * 200 for index in range(3)
+    )
+
+    bodies.clear()
+    app = GZipMiddleware(StreamingResponse(generator(), media_type="text/event-stream"))
+    await app(scope, receive, send)
+
+    # Each chunk of an event stream can be decompressed as soon as it arrives.
+    decompressor = zlib.decompressobj(31)
+    assert decompressor.decompress(bodies[0]) == b"chunk 0 " * 200
+    assert decompressor.decompress(bodies[1]) == b"chunk 1 " * 200
+    assert decompressor.decompress(b"".join(bodies[2:])) == b"chunk 2 " * 200
+    assert decompressor.eof
+
+
+@pytest.mark.anyio
+async def test_gzip_strips_trailers_from_compressed_responses():
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "extensions": {"http.response.trailers": {}},
+    }
+    app = GZipMiddleware(
+        StreamingResponse(iter([b"x" * 1000, b"y" * 1000]), checksum="crc32")
+    )
+    await app(scope, receive, send)
+
+    assert b"trailer" not in dict(messages[0]["headers"])
+    assert messages[-1] == {
+        "type": "http.response.trailers",
+        "headers": [],
+        "more_trailers": False,
+    }
@@ -1,4 +1,10 @@
-from starlette.middleware import Middleware
+import pytest
+
+from starlette.applications import Starlette
+from starlette.datastructures import MutableHeaders
+from starlette.middleware import Middleware, ScopedMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Mount, Route, WebSocketRoute
 
 
 class CustomMiddleware:
@@ -8,3 +14,199 @@ class CustomMiddleware:
 def test_middleware_repr():
     middleware = Middleware(CustomMiddleware)
     assert repr(middleware) == "Middleware(CustomMiddleware)"
+
+
+def test_scoped_middleware_repr():
+    middleware = Middleware(
+        ScopedMiddleware,
+        middleware=Middleware(CustomMiddleware),
+        exclude_paths=["/static"],
+    )
+    assert repr(middleware) == (
+        "Middleware(ScopedMiddleware, middleware=Middleware(CustomMiddleware), "
+        "exclude_paths=['/static'])"
+    )
+
+
+class HeaderMiddleware:
+    def __init__(self, app, name="Custom"):
+        self.app = app
+        self.name = name
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Middleware", self.name)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def homepage(request):
+    return PlainTextResponse(request.url.path)
+
+
+async def websocket_endpoint(session):
+    await session.accept()
+    await session.send_text("Hello, world!")
+    await session.close()
+
+
+def make_app(**scope_options):
+    return Starlette(
+        routes=[
+            Route("/{path:path}", homepage, methods=["GET", "POST"]),
+            WebSocketRoute("/ws/{path:path}", websocket_endpoint),
+        ],
+        middleware=[
+            Middleware(
+                ScopedMiddleware,
+                middleware=Middleware(HeaderMiddleware, name="scoped"),
+                **scope_options,
+            )
+        ],
+    )
+
+
+@pytest.mark.parametrize(
+    "scope_options, method, path, applies",
+    [
+        ({}, "GET", "/static/app.css", True),
+        ({"exclude_paths": ["/static"]}, "GET", "/static", False),
+        ({"exclude_paths": ["/static"]}, "GET", "/static/app.css", False),
+        ({"exclude_paths": ["/static/"]}, "GET", "/static/app.css", False),
+        ({"exclude_paths": ["/static"]}, "GET", "/staticfiles", True),
+        ({"exclude_paths": ["/static", "/healthz"]}, "GET", "/healthz", False),
+        ({"include_paths": ["/api"]}, "GET", "/api/users", True),
+        ({"include_paths": ["/api"]}, "GET", "/", False),
+        ({"include_paths": ["/"]}, "GET", "/", True),
+        (
+            {"include_paths": ["/api"], "exclude_paths": ["/api/public"]},
+            "GET",
+            "/api/public/x",
+            False,
+        ),
+        ({"include_methods": ["post"]}, "POST", "/", True),
+        ({"include_methods": ["POST"]}, "GET", "/", False),
+        ({"exclude_methods": ["GET"]}, "GET", "/", False),
+        ({"exclude_methods": ["GET"]}, "POST", "/", True),
+    ],
+)
+def test_scoped_middleware(test_client_factory, scope_options, method, path, applies):
+    client = test_client_factory(make_app(**scope_options))
+    response = client.request(method, path)
+    assert response.text == path
+    assert ("x-middleware" in response.headers) is applies
+
+
+def test_scoped_middleware_websocket(test_client_factory):
+    app = make_app(exclude_paths=["/ws/skip"], include_methods=["POST"])
+    client = test_client_factory(app)
+    # Methods don't apply to websockets, so only the paths are checked.
+    with client.websocket_connect("/ws/skip") as session:
+        assert session.receive_text() == "Hello, world!"
+    with client.websocket_connect("/ws/other") as session:
+        assert session.receive_text() == "Hello, world!"
+
+
+def test_scoped_middleware_instance_is_bypassed(test_client_factory):
+    endpoint = PlainTextResponse("ok")
+    app = ScopedMiddleware(
+        endpoint, Middleware(HeaderMiddleware), exclude_paths=["/static"]
+    )
+    assert app.app is endpoint
+    assert isinstance(app.middleware, HeaderMiddleware)
+
+    client = test_client_factory(app)
+    client.get("/static/app.css")
+    assert app.middleware.calls == 0
+    client.get("/")
+    assert app.middleware.calls == 1
+
+
+def test_scoped_middleware_options_dont_collide(test_client_factory):
+    class PathsMiddleware(HeaderMiddleware):
+        def __init__(self, app, exclude_paths):
+            super().__init__(app, name=",".join(exclude_paths))
+
+    app = Starlette(
+        routes=[Route("/{path:path}", homepage)],
+        middleware=[
+            Middleware(
+                ScopedMiddleware,
+                middleware=Middleware(PathsMiddleware, exclude_paths=["/own"]),
+                include_paths=["/api"],
+            )
+        ],
+    )
+    client = test_client_factory(app)
+    # The middleware gets its own `exclude_paths`, and the scoping is kept.
+    assert client.get("/api").headers["x-middleware"] == "/own"
+    assert "x-middleware" not in client.get("/").headers
+
+    cls, options = app.user_middleware[0]
+    assert cls is ScopedMiddleware
+    assert options["include_paths"] == ["/api"]
+
+
+def test_scoped_middleware_runs_for_lifespan(test_client_factory):
+    scopes = []
+
+    class LifespanMiddleware:
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            scopes.append(scope["type"])
+            await self.app(scope, receive, send)
+
+    app = Starlette(
+        middleware=[
+            Middleware(
+                ScopedMiddleware,
+                middleware=Middleware(LifespanMiddleware),
+                include_paths=["/api"],
+            )
+        ]
+    )
+    with test_client_factory(app):
+        pass
+    assert scopes == ["lifespan"]
+
+
+def test_scoped_middleware_in_mount(test_client_factory):
+    app = Starlette(
+        routes=[
+            Mount(
+                "/api",
+                routes=[Route("/{path:path}", homepage)],
+                middleware=[
+                    Middleware(
+                        ScopedMiddleware,
+                        middleware=Middleware(HeaderMiddleware),
+                        exclude_paths=["/health"],
+                    )
+                ],
+            )
+        ]
+    )
+    client = test_client_factory(app)
+    # Paths are matched relative to the mount.
+    assert "x-middleware" not in client.get("/api/health").headers
+    assert "x-middleware" in client.get("/api/users").headers
+
+
+def test_scoped_middleware_add_middleware(test_client_factory):
+    app = Starlette(routes=[Route("/{path:path}", homepage)])
+    app.add_middleware(
+        ScopedMiddleware,
+        middleware=Middleware(HeaderMiddleware, name="added"),
+        include_paths=["/api"],
+    )
+    client = test_client_factory(app)
+    assert client.get("/api").headers["x-middleware"] == "added"
+    assert "x-middleware" not in client.get("/").headers
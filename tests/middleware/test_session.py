@@ -1,10 +1,20 @@
 import re
+import time
+
+import anyio
+import pytest
 
 from starlette.applications import Starlette
 from starlette.middleware import Middleware
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import JSONResponse
 from starlette.routing import Mount, Route
+from starlette.sessions import (
+    FileSessionStore,
+    MemorySessionStore,
+    generate_session_id,
+    is_valid_session_id,
+)
 from starlette.testclient import TestClient
 
 
@@ -23,6 +33,11 @@ async def clear_session(request):
     return JSONResponse({"session": request.session})
 
 
+def cookie_session_id(cookie):
+    # Store session cookies hold the signed session ID, "<id>.<time>.<sig>".
+    return cookie.split(".")[0]
+
+
 def test_session(test_client_factory):
     app = Starlette(
         routes=[
@@ -178,3 +193,239 @@ def test_session_cookie(test_client_factory):
     client.cookies.delete("session")
     response = client.get("/view_session")
     assert response.json() == {"session": {}}
+
+
+def test_session_store(test_client_factory):
+    store = MemorySessionStore()
+    app = Starlette(
+        routes=[
+            Route("/view_session", endpoint=view_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+            Route("/clear_session", endpoint=clear_session, methods=["POST"]),
+        ],
+        middleware=[Middleware(SessionMiddleware, secret_key="example", store=store)],
+    )
+    client = test_client_factory(app)
+
+    response = client.get("/view_session")
+    assert response.json() == {"session": {}}
+    assert "set-cookie" not in response.headers
+
+    response = client.post("/update_session", json={"some": "data"})
+    assert response.json() == {"session": {"some": "data"}}
+    # Only the session ID is sent in the cookie.
+    session_id = cookie_session_id(client.cookies["session"])
+    assert is_valid_session_id(session_id)
+    assert store.load(session_id) == {"some": "data"}
+    set_cookie = response.headers["set-cookie"]
+    assert f"; Max-Age={14 * 24 * 3600};" in set_cookie
+
+    # Unmodified sessions aren't written back.
+    response = client.get("/view_session")
+    assert response.json() == {"session": {"some": "data"}}
+    assert "set-cookie" not in response.headers
+
+    response = client.post("/update_session", json={"more": "data"})
+    assert cookie_session_id(client.cookies["session"]) == session_id
+    assert store.load(session_id) == {"some": "data", "more": "data"}
+
+    response = client.post("/clear_session")
+    assert response.json() == {"session": {}}
+    assert "expires=Thu, 01 Jan 1970 00:00:00 GMT" in response.headers["set-cookie"]
+    assert store.load(session_id) is None
+
+    response = client.get("/view_session")
+    assert response.json() == {"session": {}}
+
+
+def test_session_store_loads_lazily(test_client_factory):
+    loads = []
+
+    class CountingStore(MemorySessionStore):
+        def load(self, session_id):
+            loads.append(session_id)
+            return super().load(session_id)
+
+    def no_session(request):
+        return JSONResponse({})
+
+    store = CountingStore()
+    app = Starlette(
+        routes=[
+            Route("/no_session", endpoint=no_session),
+            Route("/view_session", endpoint=view_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+        ],
+        middleware=[Middleware(SessionMiddleware, secret_key="example", store=store)],
+    )
+    client = test_client_factory(app)
+    client.post("/update_session", json={"some": "data"})
+
+    response = client.get("/no_session")
+    assert "set-cookie" not in response.headers
+    assert loads == []
+
+    client.get("/view_session")
+    assert loads == [cookie_session_id(client.cookies["session"])]
+
+
+def test_session_store_rejects_unknown_session_ids(test_client_factory):
+    store = MemorySessionStore()
+    app = Starlette(
+        routes=[
+            Route("/view_session", endpoint=view_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+        ],
+        middleware=[Middleware(SessionMiddleware, secret_key="example", store=store)],
+    )
+
+    for cookie in ["invalid", generate_session_id()]:
+        client = test_client_factory(app, cookies={"session": cookie})
+        response = client.get("/view_session")
+        assert response.json() == {"session": {}}
+
+        # A new session ID is issued, rather than one chosen by the client.
+        response = client.post("/update_session", json={"some": "data"})
+        session_id = cookie_session_id(response.cookies["session"])
+        assert session_id != cookie
+        assert store.load(session_id) == {"some": "data"}
+
+
+@pytest.mark.parametrize("with_store", [False, True])
+def test_unmodified_session_is_not_sent(test_client_factory, monkeypatch, with_store):
+    def append_item(request):
+        request.session["items"].append(len(request.session["items"]))
+        return JSONResponse({"session": request.session})
+
+    def set_items(request):
+        request.session["items"] = list(request.session["items"])
+        return JSONResponse({"session": request.session})
+
+    store = MemorySessionStore() if with_store else None
+    app = Starlette(
+        routes=[
+            Route("/view_session", endpoint=view_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+            Route("/append_item", endpoint=append_item, methods=["POST"]),
+            Route("/set_items", endpoint=set_items, methods=["POST"]),
+        ],
+        middleware=[Middleware(SessionMiddleware, secret_key="example", store=store)],
+    )
+    client = test_client_factory(app)
+
+    response = client.post("/update_session", json={"items": []})
+    assert "set-cookie" in response.headers
+
+    response = client.get("/view_session")
+    assert response.json() == {"session": {"items": []}}
+    assert "set-cookie" not in response.headers
+
+    # Setting a value to what it already was isn't a change.
+    response = client.post("/set_items")
+    assert "set-cookie" not in response.headers
+
+    # Changes inside session values are saved too.
+    response = client.post("/append_item")
+    assert "set-cookie" in response.headers
+    assert client.get("/view_session").json() == {"session": {"items": [0]}}
+
+    # Cookies are sent again once they're older than the refresh interval.
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 60 * 60)
+    response = client.get("/view_session")
+    assert response.json() == {"session": {"items": [0]}}
+    assert "set-cookie" in response.headers
+    response = client.get("/view_session")
+    assert "set-cookie" not in response.headers
+
+
+@pytest.mark.parametrize("refresh_interval, refreshed", [(0, True), (None, False)])
+def test_session_refresh_interval(
+    test_client_factory, monkeypatch, refresh_interval, refreshed
+):
+    app = Starlette(
+        routes=[
+            Route("/view_session", endpoint=view_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+        ],
+        middleware=[
+            Middleware(
+                SessionMiddleware,
+                secret_key="example",
+                refresh_interval=refresh_interval,
+            )
+        ],
+    )
+    client = test_client_factory(app)
+    client.post("/update_session", json={"some": "data"})
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 13 * 24 * 60 * 60)
+    response = client.get("/view_session")
+    assert response.json() == {"session": {"some": "data"}}
+    assert ("set-cookie" in response.headers) is refreshed
+
+
+def test_session_store_refresh_interval(test_client_factory, monkeypatch):
+    def no_session(request):
+        return JSONResponse({})
+
+    store = MemorySessionStore()
+    app = Starlette(
+        routes=[
+            Route("/no_session", endpoint=no_session),
+            Route("/update_session", endpoint=update_session, methods=["POST"]),
+        ],
+        middleware=[Middleware(SessionMiddleware, secret_key="example", store=store)],
+    )
+    client = test_client_factory(app)
+    client.post("/update_session", json={"some": "data"})
+    session_id = cookie_session_id(client.cookies["session"])
+
+    response = client.get("/no_session")
+    assert "set-cookie" not in response.headers
+
+    # Once the cookie is older than the refresh interval, the session and its
+    # cookie are saved again, even if the application doesn't use it.
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 2 * 60 * 60)
+    response = client.get("/no_session")
+    assert "set-cookie" in response.headers
+    assert cookie_session_id(client.cookies["session"]) == session_id
+    _, expires = store.sessions[session_id]
+    assert expires == now + 2 * 60 * 60 + 14 * 24 * 60 * 60
+
+
+def test_session_store_blocking_io_runs_in_threadpool(
+    test_client_factory, monkeypatch, tmp_path
+):
+    calls = []
+    run_sync = anyio.to_thread.run_sync
+
+    async def recording_run_sync(func, *args, **kwargs):
+        calls.append(func.__name__)
+        return await run_sync(func, *args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", recording_run_sync)
+
+    for store, expected in [
+        (MemorySessionStore(), []),
+        (FileSessionStore(tmp_path), ["save", "load", "delete"]),
+    ]:
+        calls.clear()
+        app = Starlette(
+            routes=[
+                Route("/update_session", endpoint=update_session, methods=["POST"]),
+                Route("/clear_session", endpoint=clear_session, methods=["POST"]),
+            ],
+            middleware=[
+                Middleware(SessionMiddleware, secret_key="example", store=store)
+            ],
+        )
+        client = test_client_factory(app)
+        client.post("/update_session", json={"some": "data"})
+        client.post("/clear_session")
+        # Blocking stores are read in the threadpool before the endpoint runs,
+        # and only for requests with a session cookie.
+        names = ("load", "save", "delete")
+        assert [name for name in calls if name in names] == expected
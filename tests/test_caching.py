@@ -0,0 +1,169 @@
+from starlette.applications import Starlette
+from starlette.caching import ResponseCache
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def test_response_cache(test_client_factory):
+    calls = 0
+    cache = ResponseCache(ttl=60)
+
+    @cache
+    async def flags(request):
+        nonlocal calls
+        calls += 1
+        return JSONResponse({"user": request.path_params["user"], "calls": calls})
+
+    app = Starlette(routes=[Route("/flags/{user}", flags, methods=["GET", "POST"])])
+    client = test_client_factory(app)
+
+    response = client.get("/flags/alice")
+    assert response.json() == {"user": "alice", "calls": 1}
+    etag = response.headers["etag"]
+
+    response = client.get("/flags/alice")
+    assert response.json() == {"user": "alice", "calls": 1}
+    assert response.headers["etag"] == etag
+    assert response.headers["content-length"] == str(len(response.content))
+
+    response = client.get("/flags/alice", headers={"if-none-match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    assert client.get("/flags/bob").json() == {"user": "bob", "calls": 2}
+    assert client.get("/flags/alice?x=1").json() == {"user": "alice", "calls": 3}
+    assert client.post("/flags/alice").json() == {"user": "alice", "calls": 4}
+    assert client.post("/flags/alice").json() == {"user": "alice", "calls": 5}
+    assert calls == 5
+
+
+def test_response_cache_sync_endpoint(test_client_factory):
+    calls = 0
+
+    @ResponseCache()
+    def endpoint(request):
+        nonlocal calls
+        calls += 1
+        return PlainTextResponse("hello", headers={"etag": '"custom"'})
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    client = test_client_factory(app)
+
+    for _ in range(3):
+        response = client.get("/")
+        assert response.text == "hello"
+        assert response.headers["etag"] == '"custom"'
+    assert calls == 1
+
+
+def test_response_cache_expiry_and_eviction(test_client_factory):
+    calls = 0
+
+    async def endpoint(request):
+        nonlocal calls
+        calls += 1
+        return PlainTextResponse("x" * 10)
+
+    expired = ResponseCache(ttl=0)
+    app = Starlette(routes=[Route("/", expired(endpoint))])
+    client = test_client_factory(app)
+    client.get("/")
+    client.get("/")
+    assert calls == 2
+
+    small = ResponseCache(max_entries=2, max_size=25)
+    app = Starlette(routes=[Route("/{n}", small(endpoint))])
+    client = test_client_factory(app)
+    for n in range(3):
+        client.get(f"/{n}")
+    assert len(small.entries) == 2
+    assert small.size == 20
+
+    small.clear()
+    assert small.entries == {} and small.size == 0
+
+
+def test_response_cache_skips_uncacheable_responses(test_client_factory):
+    calls = 0
+    cache = ResponseCache()
+
+    @cache
+    async def streaming(request):
+        nonlocal calls
+        calls += 1
+        return StreamingResponse(iter(["a", "b"]))
+
+    @cache
+    async def not_found(request):
+        nonlocal calls
+        calls += 1
+        return PlainTextResponse("missing", status_code=404)
+
+    @cache
+    async def with_cookie(request):
+        nonlocal calls
+        calls += 1
+        response = PlainTextResponse("hi")
+        response.set_cookie("session", "abc")
+        return response
+
+    app = Starlette(
+        routes=[
+            Route("/streaming", streaming),
+            Route("/not-found", not_found),
+            Route("/with-cookie", with_cookie),
+        ]
+    )
+    client = test_client_factory(app)
+    for path in ("/streaming", "/not-found", "/with-cookie"):
+        client.get(path)
+        client.get(path)
+    assert calls == 6
+    assert cache.entries == {}
+
+
+def test_response_cache_copies_buffers(test_client_factory):
+    buffer = bytearray(b"first")
+    cache = ResponseCache()
+
+    @cache
+    async def shared(request):
+        return PlainTextResponse(memoryview(buffer))
+
+    client = test_client_factory(Starlette(routes=[Route("/", shared)]))
+    assert client.get("/").text == "first"
+    buffer[:] = b"other"
+    assert client.get("/").text == "first"
+
+
+def test_response_cache_varies_on_request_headers(test_client_factory):
+    calls = 0
+    cache = ResponseCache(ttl=60)
+
+    @cache
+    async def greeting(request):
+        nonlocal calls
+        calls += 1
+        language = request.headers.get("accept-language", "en")
+        text = {"en": "Hello", "fr": "Bonjour"}[language]
+        return PlainTextResponse(text, headers={"vary": "Accept-Language"})
+
+    @cache
+    async def anything(request):
+        nonlocal calls
+        calls += 1
+        return PlainTextResponse("anything", headers={"vary": "*"})
+
+    app = Starlette(routes=[Route("/", greeting), Route("/anything", anything)])
+    client = test_client_factory(app)
+
+    # The first response is keyed on the varied request headers too.
+    assert client.get("/", headers={"accept-language": "fr"}).text == "Bonjour"
+    assert client.get("/").text == "Hello"
+    assert client.get("/", headers={"accept-language": "fr"}).text == "Bonjour"
+    assert client.get("/").text == "Hello"
+    assert calls == 2
+
+    client.get("/anything")
+    client.get("/anything")
+    assert calls == 4
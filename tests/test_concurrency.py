@@ -1,10 +1,11 @@
+import time
 from contextvars import ContextVar
 
 import anyio
 import pytest
 
 from starlette.applications import Starlette
-from starlette.concurrency import run_until_first_complete
+from starlette.concurrency import iterate_in_threadpool, run_until_first_complete
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.routing import Route
@@ -40,3 +41,71 @@ def test_accessing_context_from_threaded_sync_endpoint(test_client_factory) -> N
 
     resp = client.get("/")
     assert resp.content == b"data"
+
+
+@pytest.mark.anyio
+async def test_iterate_in_threadpool_batches_items(monkeypatch):
+    hops = 0
+    run_sync = anyio.to_thread.run_sync
+
+    async def counting_run_sync(*args, **kwargs):
+        nonlocal hops
+        hops += 1
+        return await run_sync(*args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", counting_run_sync)
+
+    items = [item async for item in iterate_in_threadpool(iter(range(100)))]
+    assert items == list(range(100))
+    assert hops == 101
+
+    hops = 0
+    iterator = iterate_in_threadpool(iter(range(100)), batch_size=30)
+    items = [item async for item in iterator]
+    assert items == list(range(100))
+    assert hops == 4
+
+    hops = 0
+    chunk_iterator = iterate_in_threadpool(
+        iter([b"x" * 10] * 10), batch_size=100, batch_bytes=25
+    )
+    chunks = [chunk async for chunk in chunk_iterator]
+    assert chunks == [b"x" * 10] * 10
+    assert hops == 4
+
+
+@pytest.mark.anyio
+async def test_iterate_in_threadpool_batch_delivers_items_before_exception():
+    def numbers():
+        yield 1
+        yield 2
+        raise ValueError("oops")
+
+    items = []
+    with pytest.raises(ValueError, match="oops"):
+        async for item in iterate_in_threadpool(numbers(), batch_size=10):
+            items.append(item)
+    assert items == [1, 2]
+
+
+@pytest.mark.anyio
+async def test_iterate_in_threadpool_batch_does_not_wait_on_slow_items(monkeypatch):
+    hops = 0
+    run_sync = anyio.to_thread.run_sync
+
+    async def counting_run_sync(*args, **kwargs):
+        nonlocal hops
+        hops += 1
+        return await run_sync(*args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", counting_run_sync)
+
+    def slow_numbers():
+        for number in range(3):
+            time.sleep(0.01)
+            yield number
+
+    iterator = iterate_in_threadpool(slow_numbers(), batch_size=10)
+    items = [item async for item in iterator]
+    assert items == [0, 1, 2]
+    assert hops == 4
@@ -484,6 +484,57 @@ def test_request_send_push_promise_without_push_extension(test_client_factory):
     assert response.json() == {"json": "OK"}
 
 
+def test_request_send_early_hints(test_client_factory):
+    messages = []
+
+    async def app(scope, receive, send):
+        # the server supports early hints
+        scope["extensions"]["http.response.early_hint"] = {}
+
+        async def recording_send(message):
+            messages.append(message)
+            await send(message)
+
+        request = Request(scope, receive, recording_send)
+        await request.send_early_hints(
+            ["</style.css>; rel=preload; as=style", "</app.js>; rel=preload; as=script"]
+        )
+
+        response = JSONResponse({"json": "OK"})
+        await response(scope, receive, send)
+
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.json() == {"json": "OK"}
+    assert messages == [
+        {
+            "type": "http.response.early_hint",
+            "links": [
+                b"</style.css>; rel=preload; as=style",
+                b"</app.js>; rel=preload; as=script",
+            ],
+        }
+    ]
+
+
+def test_request_send_early_hints_without_extension(test_client_factory):
+    """
+    If server does not support the `http.response.early_hint` extension,
+    .send_early_hints() does nothing.
+    """
+
+    async def app(scope, receive, send):
+        request = Request(scope)
+        await request.send_early_hints(["</style.css>; rel=preload; as=style"])
+
+        response = JSONResponse({"json": "OK"})
+        await response(scope, receive, send)
+
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.json() == {"json": "OK"}
+
+
 def test_request_send_push_promise_without_setting_send(test_client_factory):
     """
     If Request is instantiated without the send channel, then
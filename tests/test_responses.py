@@ -1,7 +1,16 @@
+import array
+import base64
 import datetime as dt
+import hashlib
+import io
 import os
+import sys
+import tarfile
+import threading
 import time
 import typing
+import zipfile
+import zlib
 from http.cookies import SimpleCookie
 
 import anyio
@@ -11,14 +20,25 @@ from starlette import status
 from starlette.background import BackgroundTask
 from starlette.requests import Request
 from starlette.responses import (
+    ArchiveEntry,
+    ArchiveResponse,
+    EventBroadcast,
+    EventSourceResponse,
     FileResponse,
     JSONResponse,
+    PlainTextResponse,
     RedirectResponse,
     Response,
+    ResponseTemplate,
+    ServerSentEvent,
+    StreamingJSONResponse,
     StreamingResponse,
 )
 from starlette.testclient import TestClient
 
+if sys.version_info < (3, 11):  # pragma: no cover
+    from exceptiongroup import ExceptionGroup
+
 
 def test_text_response(test_client_factory):
     async def app(scope, receive, send):
@@ -40,6 +60,28 @@ def test_bytes_response(test_client_factory):
     assert response.content == b"xxxxx"
 
 
+def test_buffer_response(test_client_factory):
+    buffer = bytearray(b"xxxxxyyyyy")
+    numbers = memoryview(array.array("i", [1, 2, 3]))
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/numbers":
+            response = Response(numbers, media_type="application/octet-stream")
+        else:
+            response = Response(memoryview(buffer)[5:], media_type="image/png")
+        assert not isinstance(response.body, bytes)
+        await response(scope, receive, send)
+
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.content == b"yyyyy"
+    assert response.headers["content-length"] == "5"
+
+    response = client.get("/numbers")
+    assert response.content == numbers.tobytes()
+    assert response.headers["content-length"] == str(numbers.nbytes)
+
+
 def test_json_none_response(test_client_factory):
     async def app(scope, receive, send):
         response = JSONResponse(None)
@@ -178,6 +220,692 @@ def test_sync_streaming_response(test_client_factory):
     assert response.text == "1, 2, 3, 4, 5"
 
 
+@pytest.mark.anyio
+async def test_streaming_response_passes_buffers_through():
+    buffer = bytearray(b"abcdef")
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def chunks():
+        yield memoryview(buffer)[:3]
+        yield "-"
+        yield buffer
+
+    response = StreamingResponse(chunks())
+    await response.stream_response(send)
+    assert bodies[0].obj is buffer
+    assert bodies[1:] == [b"-", buffer, b""]
+    assert bodies[2] is buffer
+
+    bodies.clear()
+    response = StreamingResponse(chunks(), buffer_size=1024)
+    await response.stream_response(send)
+    assert bodies == [b"abc-abcdef"]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_coalesces_chunks():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append((message["body"], message["more_body"]))
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    def rows():
+        for i in range(10):
+            yield f"{i},"
+            yield b"x" * 3
+
+    response = StreamingResponse(rows(), buffer_size=10)
+    await response({}, receive, send)
+
+    assert b"".join(body for body, _ in bodies) == b"".join(
+        f"{i},".encode() + b"xxx" for i in range(10)
+    )
+    assert len(bodies) == 6
+    assert all(len(body) >= 10 for body, _ in bodies[:-1])
+    assert [more_body for _, more_body in bodies] == [True] * 5 + [False]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_flushes_buffer_after_latency():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def slow_stream():
+        yield "first"
+        await anyio.sleep(0.1)
+        yield "second"
+
+    response = StreamingResponse(slow_stream(), buffer_size=1024, buffer_latency=0.01)
+    await response({}, receive, send)
+
+    assert bodies == [b"first", b"second"]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_prefetch_overlaps_production_and_sending():
+    events = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message["more_body"]:
+            events.append(("send", message["body"]))
+            # A slow network write, during which the producer keeps working.
+            await anyio.sleep(0.01)
+
+    async def numbers():
+        for number in range(6):
+            events.append(("produce", number))
+            yield str(number)
+
+    response = StreamingResponse(numbers(), prefetch=2)
+    await response({}, receive, send)
+
+    assert [body for event, body in events if event == "send"] == [
+        b"0",
+        b"1",
+        b"2",
+        b"3",
+        b"4",
+        b"5",
+    ]
+    # The producer runs ahead of the sender, but never more than `prefetch`
+    # chunks beyond the one being sent, plus the one waiting to be queued.
+    produced = sent = 0
+    for event, _ in events:
+        if event == "produce":
+            produced += 1
+        else:
+            sent += 1
+        assert produced - sent <= 3
+    assert events.index(("produce", 2)) < events.index(("send", b"1"))
+
+
+@pytest.mark.anyio
+async def test_streaming_response_prefetch_cancels_producer_on_disconnect():
+    produced = 0
+    disconnected = anyio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            disconnected.set()
+
+    async def stream_indefinitely():
+        nonlocal produced
+        while True:
+            await anyio.sleep(0)
+            produced += 1
+            yield b"chunk "
+
+    response = StreamingResponse(stream_indefinitely(), prefetch=4)
+    with anyio.move_on_after(1) as cancel_scope:
+        await response({}, receive, send)
+    assert not cancel_scope.cancel_called, "Content streaming should stop itself."
+    stopped_at = produced
+    await anyio.sleep(0.01)
+    assert produced == stopped_at <= 6
+
+
+@pytest.mark.anyio
+async def test_streaming_response_prefetch_propagates_errors():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append((message["body"], message["more_body"]))
+
+    async def failing():
+        yield b"first"
+        raise ValueError("upstream failed")
+
+    response = StreamingResponse(failing(), prefetch=1, buffer_size=1024)
+    with pytest.raises(ExceptionGroup) as exc:
+        await response.stream_response(send)
+    assert len(exc.value.exceptions) == 1
+    assert isinstance(exc.value.exceptions[0], ValueError)
+    assert bodies == []
+
+
+@pytest.mark.anyio
+async def test_streaming_response_does_not_buffer_event_streams():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    response = StreamingResponse(
+        iter(["data: 1\n\n", "data: 2\n\n"]),
+        media_type="text/event-stream",
+        buffer_size=1024,
+    )
+    await response({}, receive, send)
+
+    assert bodies == [b"data: 1\n\n", b"data: 2\n\n", b""]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_sends_sync_items_before_blocking():
+    bodies = []
+    sent_first = threading.Event()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+            sent_first.set()
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    def progress():
+        yield b"started"
+        # Blocks until the first item has reached the client.
+        assert sent_first.wait(timeout=5)
+        yield b"done"
+
+    with anyio.fail_after(10):
+        await StreamingResponse(progress())({}, receive, send)
+    assert bodies == [b"started", b"done", b""]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_threadpool_batch_size(monkeypatch):
+    hops = 0
+    run_sync = anyio.to_thread.run_sync
+
+    async def counting_run_sync(*args, **kwargs):
+        nonlocal hops
+        hops += 1
+        return await run_sync(*args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", counting_run_sync)
+
+    async def send(message):
+        pass
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    rows = [b"row\n"] * 100
+    await StreamingResponse(iter(rows))({}, receive, send)
+    assert hops == 101
+
+    hops = 0
+    await StreamingResponse(iter(rows), threadpool_batch_size=50)({}, receive, send)
+    assert hops == 3
+
+
+def test_server_sent_event_encoding():
+    event = ServerSentEvent(data="a\nb\r\nc", event="update", id="1", retry=1000)
+    assert event.encode() == (
+        b"id: 1\nevent: update\ndata: a\ndata: b\ndata: c\nretry: 1000\n\n"
+    )
+    assert ServerSentEvent(comment="keep-alive").encode() == b": keep-alive\n\n"
+    with pytest.raises(ValueError):
+        ServerSentEvent(data="x", id="1\n2")
+
+
+def test_event_source_response(test_client_factory):
+    async def events():
+        yield ServerSentEvent(data="hello", event="greeting")
+        yield "world"
+        yield b"data: raw\n\n"
+
+    app = EventSourceResponse(events(), retry=5000)
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.headers["content-type"] == "text/event-stream; charset=utf-8"
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == (
+        "retry: 5000\n\n"
+        "event: greeting\ndata: hello\n\n"
+        "data: world\n\n"
+        "data: raw\n\n"
+    )
+
+
+def test_event_source_response_sync_iterator(test_client_factory):
+    app = EventSourceResponse(iter(["1", "2"]))
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.text == "data: 1\n\ndata: 2\n\n"
+
+
+@pytest.mark.anyio
+async def test_event_source_response_body_iterator():
+    events: typing.List[typing.Union[str, ServerSentEvent]] = [
+        "1",
+        ServerSentEvent(data="2"),
+    ]
+    response = EventSourceResponse(iter(events))
+    assert response.prefetch is None
+    assert [chunk async for chunk in response.body_iterator] == [
+        b"data: 1\n\n",
+        b"data: 2\n\n",
+    ]
+
+
+@pytest.mark.anyio
+async def test_event_source_response_sends_pings():
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def events():
+        yield "first"
+        await anyio.sleep(0.1)
+        yield "second"
+
+    response = EventSourceResponse(events(), ping_interval=0.03)
+    await response({}, receive, send)
+
+    assert bodies[0] == b"data: first\n\n"
+    assert bodies[-2:] == [b"data: second\n\n", b""]
+    assert 2 <= bodies.count(b": ping\n\n") <= 3
+
+
+@pytest.mark.anyio
+async def test_event_broadcast():
+    broadcast = EventBroadcast(max_buffer=2)
+    fast = broadcast.subscribe()
+    slow = broadcast.subscribe()
+    received_fast: typing.List[bytes] = []
+    received_slow: typing.List[bytes] = []
+
+    async def take(subscriber, count, received):
+        async for body in subscriber:  # pragma: no branch
+            received.append(body)
+            if len(received) == count:
+                return
+
+    async with anyio.create_task_group() as task_group:
+        task_group.start_soon(take, fast, 4, received_fast)
+        task_group.start_soon(take, slow, 1, received_slow)
+        await wait_for(lambda: len(broadcast.subscribers) == 2)
+
+        broadcast.publish("1")
+        await wait_for(lambda: received_slow)
+        # The slow subscriber stops reading, and is dropped once its buffer
+        # overflows.
+        for data in ("2", "3", "4"):
+            broadcast.publish(ServerSentEvent(data=data))
+            await anyio.sleep(0)
+
+    assert received_fast == [b"data: %d\n\n" % i for i in range(1, 5)]
+    assert received_slow[0] is received_fast[0]
+    assert len(broadcast.subscribers) == 1
+
+    await fast.aclose()
+    await slow.aclose()
+    assert broadcast.subscribers == set()
+
+
+async def wait_for(predicate):
+    with anyio.fail_after(1):
+        while not predicate():
+            await anyio.sleep(0)
+
+
+def test_response_template(test_client_factory):
+    template = ResponseTemplate(
+        JSONResponse, status_code=201, headers={"Cache-Control": "no-store"}
+    )
+
+    response = template({"hello": "world"}, headers={"X-Request-ID": "1"})
+    expected = JSONResponse(
+        {"hello": "world"},
+        status_code=201,
+        headers={"Cache-Control": "no-store", "X-Request-ID": "1"},
+    )
+    assert isinstance(response, JSONResponse)
+    assert response.body == expected.body
+    assert sorted(response.raw_headers) == sorted(expected.raw_headers)
+
+    other = template([1, 2, 3])
+    assert other.headers["content-length"] == "7"
+    assert "x-request-id" not in other.headers
+    assert "x-request-id" not in template({}).headers
+
+    client = test_client_factory(response)
+    http_response = client.get("/")
+    assert http_response.status_code == 201
+    assert http_response.json() == {"hello": "world"}
+    assert http_response.headers["content-type"] == "application/json"
+    assert http_response.headers["cache-control"] == "no-store"
+
+
+def test_response_template_without_content_length():
+    template = ResponseTemplate(status_code=204)
+    response = template()
+    assert response.body == b""
+    assert "content-length" not in response.headers
+
+    template = ResponseTemplate(PlainTextResponse, headers={"content-length": "2"})
+    response = template("hi")
+    assert response.headers.getlist("content-length") == ["2"]
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+
+
+def test_streaming_json_response(test_client_factory):
+    items = [{"id": i, "name": "ünïcode"} for i in range(3)]
+
+    client = test_client_factory(StreamingJSONResponse(iter(items)))
+    response = client.get("/")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == items
+    assert response.content == JSONResponse(items).body
+
+    client = test_client_factory(StreamingJSONResponse([]))
+    assert client.get("/").content == b"[]"
+
+
+def test_streaming_json_response_ndjson(test_client_factory):
+    async def items():
+        for i in range(3):
+            yield {"id": i}
+
+    client = test_client_factory(StreamingJSONResponse(items(), ndjson=True))
+    response = client.get("/")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.text == '{"id":0}\n{"id":1}\n{"id":2}\n'
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("asynchronous", [False, True])
+async def test_streaming_json_response_coalesces_chunks(asynchronous):
+    bodies = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def async_items():
+        for i in range(1000):
+            yield i
+
+    class SmallChunkJSONResponse(StreamingJSONResponse):
+        chunk_size = 100
+
+    content = async_items() if asynchronous else iter(range(1000))
+    response = SmallChunkJSONResponse(content)
+    await response({}, receive, send)
+
+    assert b"".join(bodies) == JSONResponse(list(range(1000))).body
+    assert all(100 <= len(body) < 110 for body in bodies[:-2])
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "algorithm,digest",
+    [
+        ("crc32", lambda body: zlib.crc32(body).to_bytes(4, "big")),
+        ("sha-256", lambda body: hashlib.sha256(body).digest()),
+    ],
+)
+async def test_streaming_response_checksum_trailer(algorithm, digest):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "extensions": {"http.response.trailers": {}},
+    }
+    response = StreamingResponse(iter([b"hello", b" world"]), checksum=algorithm)
+    await response(scope, receive, send)
+
+    start, *bodies, trailers = messages
+    assert start["trailers"] is True
+    assert (b"trailer", b"content-digest") in start["headers"]
+    assert b"".join(message["body"] for message in bodies) == b"hello world"
+    encoded = base64.b64encode(digest(b"hello world")).decode()
+    assert trailers == {
+        "type": "http.response.trailers",
+        "headers": [(b"content-digest", f"{algorithm}=:{encoded}:".encode())],
+        "more_trailers": False,
+    }
+
+
+@pytest.mark.anyio
+async def test_file_response_checksum_trailer(tmpdir):
+    path = os.path.join(tmpdir, "xyz")
+    content = b"<file content>" * 10000
+    with open(path, "wb") as file:
+        file.write(content)
+
+    messages = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "extensions": {"http.response.trailers": {}},
+    }
+    await FileResponse(path, checksum="sha-256")(scope, receive, send)
+    encoded = base64.b64encode(hashlib.sha256(content).digest()).decode()
+    assert messages[-1]["headers"] == [
+        (b"content-digest", f"sha-256=:{encoded}:".encode())
+    ]
+
+    messages.clear()
+    await FileResponse(path, checksum="sha-256")(
+        {**scope, "extensions": {}}, receive, send
+    )
+    assert "trailers" not in messages[0]
+    assert messages[-1]["type"] == "http.response.body"
+
+
+@pytest.mark.anyio
+async def test_checksum_hashes_large_chunks_in_threadpool(monkeypatch):
+    hashed: typing.List[int] = []
+    run_sync = anyio.to_thread.run_sync
+
+    async def recording_run_sync(func, *args, **kwargs):
+        hashed.extend(len(arg) for arg in args if isinstance(arg, bytes))
+        return await run_sync(func, *args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", recording_run_sync)
+
+    async def send(message):
+        pass
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "extensions": {"http.response.trailers": {}},
+    }
+    chunks = [b"small", b"x" * (128 * 1024)]
+    response = StreamingResponse(iter(chunks), checksum="sha-256")
+    await response(scope, receive, send)
+    assert hashed == [128 * 1024]
+
+
+def test_checksum_must_be_supported():
+    with pytest.raises(AssertionError):
+        StreamingResponse(iter([]), checksum="md5")
+
+
+def make_archive_entries(tmpdir):
+    for name, content in [("a.txt", b"hello" * 1000), ("b.bin", os.urandom(70000))]:
+        with open(os.path.join(tmpdir, name), "wb") as file:
+            file.write(content)
+
+    async def numbers():
+        for number in range(100):
+            yield f"{number}\n".encode()
+
+    return [
+        os.path.join(tmpdir, "a.txt"),
+        ArchiveEntry("data/b.bin", path=os.path.join(tmpdir, "b.bin")),
+        ArchiveEntry("numbers.txt", content=numbers(), size=290),
+        ArchiveEntry("empty.txt", content=iter([]), size=0),
+    ]
+
+
+def expected_archive_files(tmpdir):
+    with open(os.path.join(tmpdir, "b.bin"), "rb") as file:
+        data = file.read()
+    return {
+        "a.txt": b"hello" * 1000,
+        "data/b.bin": data,
+        "numbers.txt": "".join(f"{number}\n" for number in range(100)).encode(),
+        "empty.txt": b"",
+    }
+
+
+@pytest.mark.parametrize("compression", ["stored", "deflate"])
+def test_archive_response_zip(tmpdir, test_client_factory, compression):
+    entries = make_archive_entries(tmpdir)
+    app = ArchiveResponse(entries, filename="files.zip", compression=compression)
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["content-disposition"] == (
+        'attachment; filename="files.zip"'
+    )
+    if compression == "stored":
+        assert response.headers["content-length"] == str(len(response.content))
+    else:
+        assert "content-length" not in response.headers
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        files = {name: archive.read(name) for name in archive.namelist()}
+        assert archive.getinfo("a.txt").external_attr >> 16 & 0o777 == 0o644
+    assert files == expected_archive_files(tmpdir)
+
+
+def test_archive_response_tar(tmpdir, test_client_factory):
+    entries = make_archive_entries(tmpdir)
+    app = ArchiveResponse(entries, archive_format="tar")
+    client = test_client_factory(app)
+    response = client.get("/")
+    assert response.headers["content-type"] == "application/x-tar"
+    assert response.headers["content-length"] == str(len(response.content))
+
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        files = {
+            member.name: typing.cast(
+                typing.IO[bytes], archive.extractfile(member)
+            ).read()
+            for member in archive.getmembers()
+        }
+    assert files == expected_archive_files(tmpdir)
+
+
+def test_archive_response_head(tmpdir, test_client_factory):
+    app = ArchiveResponse(make_archive_entries(tmpdir)[:2], method="HEAD")
+    client = test_client_factory(app)
+    response = client.head("/")
+    assert response.content == b""
+    assert int(response.headers["content-length"]) > 75000
+
+
+def test_archive_response_unknown_size(test_client_factory):
+    entries = [ArchiveEntry("data.txt", content=iter([b"abc", b"def"]))]
+    client = test_client_factory(ArchiveResponse(entries))
+    response = client.get("/")
+    assert "content-length" not in response.headers
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.read("data.txt") == b"abcdef"
+
+
+def test_archive_response_rejects_wrong_sizes(tmpdir, test_client_factory):
+    entries = [ArchiveEntry("short.txt", content=iter([b"abc"]), size=4)]
+    client = test_client_factory(ArchiveResponse(entries))
+    with pytest.raises(RuntimeError, match="was 3 bytes, not 4"):
+        client.get("/")
+
+
+@pytest.mark.anyio
+async def test_archive_response_coalesces_small_pieces(tmpdir, monkeypatch):
+    written = []
+    run_sync = anyio.to_thread.run_sync
+
+    async def recording_run_sync(func, *args, **kwargs):
+        if getattr(func, "__name__", None) in ("read", "write"):
+            written.append(func.__name__)
+        return await run_sync(func, *args, **kwargs)
+
+    monkeypatch.setattr(anyio.to_thread, "run_sync", recording_run_sync)
+    bodies = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append(message["body"])
+
+    entries = make_archive_entries(tmpdir) + [
+        ArchiveEntry("large.txt", content=iter([b"x" * 100000])),
+        *(ArchiveEntry(f"{number}.txt", content=iter([b"x"])) for number in range(50)),
+    ]
+    response = ArchiveResponse(entries, compression="deflate")
+    await response({"type": "http", "method": "GET"}, receive, send)
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(bodies))) as archive:
+        assert archive.testzip() is None
+        assert len(archive.namelist()) == 55
+    # Small pieces are sent together, rather than one message each.
+    assert len(bodies) <= 3
+    assert all(len(body) >= ArchiveResponse.chunk_size for body in bodies[:-1])
+    # File chunks are compressed as they are read, and large content chunks
+    # are compressed in the threadpool too.
+    assert written.count("write") == 1
+    assert "read" in written
+
+
+def test_archive_response_requires_tar_sizes():
+    with pytest.raises(AssertionError):
+        ArchiveResponse([ArchiveEntry("a", content=iter([]))], archive_format="tar")
+    with pytest.raises(AssertionError):
+        ArchiveResponse([], archive_format="tar", compression="deflate")
+
+
 def test_response_headers(test_client_factory):
     async def app(scope, receive, send):
         headers = {"x-header-1": "123", "x-header-2": "456"}
@@ -245,6 +973,89 @@ def test_file_response(tmpdir, test_client_factory):
     assert filled_by_bg_task == "6, 7, 8, 9"
 
 
+@pytest.mark.anyio
+@pytest.mark.parametrize("reuse_buffer", [False, True])
+async def test_file_response_sends_exact_number_of_chunks(tmpdir, reuse_buffer):
+    path = os.path.join(tmpdir, "xyz")
+    content = os.urandom(FileResponse.chunk_size * 3)
+    with open(path, "wb") as file:
+        file.write(content)
+
+    bodies = []
+
+    async def receive():  # pragma: no cover
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            bodies.append((bytes(message["body"]), message["more_body"]))
+
+    class CustomFileResponse(FileResponse):
+        pass
+
+    CustomFileResponse.reuse_buffer = reuse_buffer
+    response = CustomFileResponse(path=path)
+    await response({"type": "http", "method": "GET"}, receive, send)
+
+    assert [more_body for _, more_body in bodies] == [True, True, False]
+    assert b"".join(body for body, _ in bodies) == content
+
+
+def test_file_response_chunk_size_scales_with_file_size(tmpdir):
+    response = FileResponse(path=os.path.join(tmpdir, "xyz"))
+    assert response.get_chunk_size(0) == FileResponse.chunk_size
+    assert response.get_chunk_size(1024 * 1024) == FileResponse.chunk_size
+    assert response.get_chunk_size(8 * 1024 * 1024) == 128 * 1024
+    assert response.get_chunk_size(1024 * 1024 * 1024) == FileResponse.max_chunk_size
+
+
+def test_file_response_empty_file(tmpdir, test_client_factory):
+    path = os.path.join(tmpdir, "xyz")
+    open(path, "wb").close()
+
+    client = test_client_factory(FileResponse(path=path))
+    response = client.get("/")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == "0"
+
+
+def test_file_response_conditional_requests(tmpdir, test_client_factory):
+    path = os.path.join(tmpdir, "xyz")
+    with open(path, "wb") as file:
+        file.write(b"<file content>")
+
+    app = FileResponse(path=path)
+    client = test_client_factory(app)
+    response = client.get("/")
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    response = client.get("/", headers={"if-none-match": f'"a", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.post("/", headers={"if-none-match": etag})
+    assert response.status_code == 412
+
+    response = client.get("/", headers={"if-match": f"W/{etag}"})
+    assert response.status_code == 412
+
+
+def test_file_response_conditional_requests_ignored_for_error_status(
+    tmpdir, test_client_factory
+):
+    path = os.path.join(tmpdir, "404.html")
+    with open(path, "wb") as file:
+        file.write(b"<file content>")
+
+    app = FileResponse(path=path, status_code=404)
+    client = test_client_factory(app)
+    response = client.get("/", headers={"if-none-match": "*"})
+    assert response.status_code == 404
+    assert response.content == b"<file content>"
+
+
 def test_file_response_with_directory_raises_error(tmpdir, test_client_factory):
     app = FileResponse(path=tmpdir, filename="example.png")
     client = test_client_factory(app)
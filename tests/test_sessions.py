@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from starlette.sessions import (
+    FileSessionStore,
+    MemorySessionStore,
+    Session,
+    SQLiteSessionStore,
+    generate_session_id,
+    is_valid_session_id,
+)
+
+
+def test_session_loads_lazily():
+    calls = []
+
+    def loader():
+        calls.append(True)
+        return {"user": "alice"}
+
+    session = Session(loader=loader)
+    assert not session.loaded
+    assert calls == []
+    session.load()
+    session.load()
+    assert session.loaded
+    assert session == {"user": "alice"}
+    assert calls == [True]
+
+    # Modifying the session loads it first.
+    for modify in [
+        lambda session: session.__setitem__("admin", True),
+        lambda session: session.setdefault("admin", True),
+        lambda session: session.update(admin=True),
+        lambda session: session.__ior__({"admin": True}),
+    ]:
+        session = Session(loader=loader)
+        modify(session)
+        assert session == {"user": "alice", "admin": True}
+
+    for remove in [
+        lambda session: session.__delitem__("user"),
+        lambda session: session.pop("user"),
+        lambda session: session.popitem(),
+        lambda session: session.clear(),
+    ]:
+        session = Session(loader=loader)
+        remove(session)
+        assert session == {}
+
+
+def test_session_ids():
+    session_id = generate_session_id()
+    assert is_valid_session_id(session_id)
+    assert session_id != generate_session_id()
+    assert not is_valid_session_id("../../etc/passwd")
+    assert not is_valid_session_id(session_id[:-1])
+
+
+@pytest.fixture(params=["memory", "file", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemorySessionStore()
+    elif request.param == "file":
+        yield FileSessionStore(tmp_path / "sessions")
+    else:
+        store = SQLiteSessionStore(tmp_path / "sessions.db")
+        yield store
+        store.close()
+
+
+def test_session_store(store):
+    session_id = generate_session_id()
+    assert store.load(session_id) is None
+
+    items = [1, 2]
+    store.save(session_id, {"user": "alice", "items": items}, max_age=60)
+    items.append(3)
+    assert store.load(session_id) == {"user": "alice", "items": [1, 2]}
+
+    store.save(session_id, {"user": "bob"}, max_age=None)
+    assert store.load(session_id) == {"user": "bob"}
+
+    store.delete(session_id)
+    assert store.load(session_id) is None
+    store.delete(session_id)
+
+
+def test_session_store_expiry(store, monkeypatch):
+    session_id = generate_session_id()
+    store.save(session_id, {"user": "alice"}, max_age=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.load(session_id) is None
+    monkeypatch.undo()
+    assert store.load(session_id) is None
+
+
+def test_memory_session_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_sessions=2)
+    first, second, third = (generate_session_id() for _ in range(3))
+    store.save(first, {"n": 1}, max_age=None)
+    store.save(second, {"n": 2}, max_age=None)
+    assert store.load(first) == {"n": 1}
+    store.save(third, {"n": 3}, max_age=None)
+    assert store.load(first) == {"n": 1}
+    assert store.load(second) is None
+    assert store.load(third) == {"n": 3}
+
+
+def test_file_session_store_ignores_invalid_files(tmp_path):
+    store = FileSessionStore(tmp_path)
+    session_id = generate_session_id()
+    (tmp_path / f"{session_id}.json").write_text("{not json")
+    assert store.load(session_id) is None
+    with pytest.raises(AssertionError):
+        store.load("../secret")
+
+
+def test_sqlite_session_store_delete_expired(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(tmp_path / "sessions.db", table="web_sessions")
+    expiring, lasting = generate_session_id(), generate_session_id()
+    store.save(expiring, {"n": 1}, max_age=60)
+    store.save(lasting, {"n": 2}, max_age=None)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    store.delete_expired()
+    rows = store.connection.execute("SELECT id FROM web_sessions").fetchall()
+    assert rows == [(lasting,)]
+    store.close()
@@ -2,6 +2,7 @@ import os
 import stat
 import tempfile
 import time
+import zipfile
 from pathlib import Path
 
 import anyio
@@ -13,7 +14,7 @@ from starlette.middleware import Middleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.routing import Mount
-from starlette.staticfiles import StaticFiles
+from starlette.staticfiles import FINGERPRINT_PATTERN, StaticFiles, ZipDirectory
 
 
 def test_staticfiles(tmpdir, test_client_factory):
@@ -548,3 +549,265 @@ def test_staticfiles_avoids_path_traversal(tmp_path: Path):
 
     assert exc_info.value.status_code == 404
     assert exc_info.value.detail == "Not Found"
+
+
+def test_staticfiles_content_etag_stable_across_mtime_changes(
+    tmpdir, test_client_factory
+):
+    path = os.path.join(tmpdir, "example.txt")
+    with open(path, "w") as file:
+        file.write("<file content>")
+
+    app = StaticFiles(directory=tmpdir, content_etag=True)
+    client = test_client_factory(app)
+    first_resp = client.get("/example.txt")
+    etag = first_resp.headers["etag"]
+
+    later = time.time() + 3600
+    os.utime(path, (later, later))
+
+    second_resp = client.get("/example.txt")
+    assert second_resp.headers["etag"] == etag
+    assert second_resp.headers["last-modified"] != first_resp.headers["last-modified"]
+
+    cached_resp = client.get("/example.txt", headers={"if-none-match": etag})
+    assert cached_resp.status_code == 304
+
+    with open(path, "w") as file:
+        file.write("<other content>")
+
+    changed_resp = client.get("/example.txt")
+    assert changed_resp.headers["etag"] != etag
+    assert changed_resp.text == "<other content>"
+
+
+def test_staticfiles_immutable_pattern(tmpdir, test_client_factory):
+    for name in ("app.3f2a9c1b.js", "app.js"):
+        with open(os.path.join(tmpdir, name), "w") as file:
+            file.write("console.log(1);")
+
+    app = StaticFiles(directory=tmpdir, immutable_pattern=FINGERPRINT_PATTERN)
+    client = test_client_factory(app)
+
+    response = client.get("/app.3f2a9c1b.js")
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+
+    response = client.get("/app.js")
+    assert "cache-control" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("app.3f2a9c1b.js", True),
+        ("logo-5d41402abc4b2a76.png", True),
+        ("app.DEADBEEF.css", True),
+        ("report-20231019.pdf", False),
+        ("app.js", False),
+        ("app.3f2a9c.js", False),
+    ],
+)
+def test_fingerprint_pattern(name, expected):
+    assert (FINGERPRINT_PATTERN.search(name) is not None) is expected
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        '"other", {etag}',
+        "W/{etag}",
+        '"other" , W/{etag} , "another"',
+        "*",
+    ],
+)
+def test_staticfiles_304_with_etag_list(tmpdir, test_client_factory, if_none_match):
+    path = os.path.join(tmpdir, "example.txt")
+    with open(path, "w") as file:
+        file.write("<file content>")
+
+    app = StaticFiles(directory=tmpdir)
+    client = test_client_factory(app)
+    etag = client.get("/example.txt").headers["etag"]
+    response = client.get(
+        "/example.txt", headers={"if-none-match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+def test_staticfiles_if_none_match_takes_precedence_over_if_modified_since(
+    tmpdir, test_client_factory
+):
+    path = os.path.join(tmpdir, "example.txt")
+    with open(path, "w") as file:
+        file.write("<file content>")
+
+    app = StaticFiles(directory=tmpdir)
+    client = test_client_factory(app)
+    last_modified = client.get("/example.txt").headers["last-modified"]
+    response = client.get(
+        "/example.txt",
+        headers={"if-none-match": '"other"', "if-modified-since": last_modified},
+    )
+    assert response.status_code == 200
+
+
+def test_staticfiles_412_with_precondition_failed(tmpdir, test_client_factory):
+    path = os.path.join(tmpdir, "example.txt")
+    with open(path, "w") as file:
+        file.write("<file content>")
+
+    app = StaticFiles(directory=tmpdir)
+    client = test_client_factory(app)
+    first_resp = client.get("/example.txt")
+    etag = first_resp.headers["etag"]
+
+    response = client.get("/example.txt", headers={"if-match": '"other"'})
+    assert response.status_code == 412
+
+    response = client.get("/example.txt", headers={"if-match": f'"other", {etag}'})
+    assert response.status_code == 200
+    assert response.text == "<file content>"
+
+    response = client.get(
+        "/example.txt",
+        headers={"if-unmodified-since": "Thu, 01 Jan 1970 00:00:00 GMT"},
+    )
+    assert response.status_code == 412
+
+    response = client.get(
+        "/example.txt",
+        headers={"if-unmodified-since": first_resp.headers["last-modified"]},
+    )
+    assert response.status_code == 200
+
+
+def make_zip(path, members, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(path, "w", compression=compression) as zip_file:
+        for name, content in members.items():
+            zip_file.writestr(name, content)
+
+
+def test_staticfiles_from_zip_directory(tmpdir, test_client_factory):
+    archive = os.path.join(tmpdir, "assets.zip")
+    make_zip(
+        archive,
+        {
+            "static/example.txt": "<file content>",
+            "static/empty.txt": "",
+            "static/nested/index.html": "<html></html>",
+            "other.txt": "<other>",
+        },
+    )
+
+    app = StaticFiles(directory=ZipDirectory(archive, "static"), html=True)
+    client = test_client_factory(app)
+
+    response = client.get("/example.txt")
+    assert response.status_code == 200
+    assert response.text == "<file content>"
+    assert response.headers["content-length"] == "14"
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+    assert "content-encoding" not in response.headers
+
+    response = client.get(
+        "/example.txt", headers={"if-none-match": response.headers["etag"]}
+    )
+    assert response.status_code == 304
+
+    response = client.get("/empty.txt")
+    assert response.status_code == 200
+    assert response.content == b""
+
+    response = client.get("/nested/")
+    assert response.status_code == 200
+    assert response.text == "<html></html>"
+
+    for path in ("/other.txt", "/../other.txt", "/missing.txt"):
+        with pytest.raises(HTTPException) as exc_info:
+            client.get(path)
+        assert exc_info.value.status_code == 404
+
+
+def test_staticfiles_from_zip_directory_deflated(tmpdir, test_client_factory):
+    archive = os.path.join(tmpdir, "assets.zip")
+    content = "<file content>" * 10000
+    make_zip(archive, {"example.txt": content}, compression=zipfile.ZIP_DEFLATED)
+
+    app = StaticFiles(directory=ZipDirectory(archive))
+    client = test_client_factory(app)
+
+    response = client.get("/example.txt", headers={"accept-encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(content)
+    assert response.text == content
+
+    response = client.get("/example.txt", headers={"accept-encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == str(len(content))
+    assert response.text == content
+
+    response = client.head("/example.txt", headers={"accept-encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == b""
+
+    response = client.get("/example.txt", headers={"accept-encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+    assert response.text == content
+
+
+def test_staticfiles_from_zip_directory_inflates_without_zipfile(
+    tmpdir, test_client_factory, monkeypatch
+):
+    archive = os.path.join(tmpdir, "assets.zip")
+    content = os.urandom(200 * 1024).hex()
+    make_zip(archive, {"example.txt": content}, compression=zipfile.ZIP_DEFLATED)
+    directory = ZipDirectory(archive)
+
+    # The archive is only indexed once, when the directory is created.
+    def no_zip_file(*args, **kwargs):  # pragma: no cover
+        raise AssertionError("The archive should not be re-read")
+
+    monkeypatch.setattr(zipfile, "ZipFile", no_zip_file)
+    client = test_client_factory(StaticFiles(directory=directory))
+    for _ in range(2):
+        response = client.get("/example.txt", headers={"accept-encoding": "br"})
+        assert "content-encoding" not in response.headers
+        assert response.text == content
+
+
+def test_zip_directory_skips_unsupported_compression(tmpdir, test_client_factory):
+    archive = os.path.join(tmpdir, "assets.zip")
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("example.txt", "content")
+        zip_file.writestr(
+            "nested/bzip2.txt", "content", compress_type=zipfile.ZIP_BZIP2
+        )
+
+    directory = ZipDirectory(archive)
+    assert list(directory.members) == ["example.txt"]
+    app = Starlette(routes=[Mount("/", app=StaticFiles(directory=directory))])
+    client = test_client_factory(app)
+    assert client.get("/example.txt").text == "content"
+    assert client.get("/nested/bzip2.txt").status_code == 404
+
+
+def test_staticfiles_with_zipped_package(tmpdir, test_client_factory, monkeypatch):
+    archive = os.path.join(tmpdir, "app.pyz")
+    make_zip(
+        archive,
+        {
+            "zipped_statics_package/__init__.py": "",
+            "zipped_statics_package/statics/example.txt": "123\n",
+        },
+    )
+    monkeypatch.syspath_prepend(archive)
+
+    app = StaticFiles(packages=["zipped_statics_package"])
+    client = test_client_factory(app)
+    response = client.get("/example.txt")
+    assert response.status_code == 200
+    assert response.text == "123\n"